@@ -1,15 +1,29 @@
 """
 Main script for running and finding functions.
 
+Usage:   python3 function_finder.py [--headless]
+
 """
+import time
+
+# Start timing before the imports so the import-time budget can be checked in headless mode.
+IMPORT_START = time.perf_counter()
+
 import json
+import sys
+
+import numpy as np
 
 from src.equation_tree import EquationTree
-from src.math_functions import *
-from src.nucleus import Nucleus
+from src.math_functions import Add, Subtract, Multiply, Divide, IndependentVariable
+from src.nucleus import ERROR_THRESHOLD, Nucleus
+from src.reporting import SINKS
 
+IMPORT_TIME = time.perf_counter() - IMPORT_START
 # Configuration file.
 VALUES_FILE = 'values.json'
+# Max seconds to spend importing before evolution starts in headless mode.
+IMPORT_BUDGET = 0.25
 # Mapping of math function names to themselves.
 MATH_FUNCTIONS = {
     'Add': Add,
@@ -17,6 +31,11 @@ MATH_FUNCTIONS = {
     'Multiply': Multiply,
     'Divide': Divide
 }
+# Mapping of precision names to NumPy types.
+PRECISIONS = {
+    'float32': np.float32,
+    'float64': np.float64
+}
 
 
 class Main:
@@ -35,6 +54,17 @@ class Main:
         functions (frozenset): The set of possible functions that can be selected from.
         max_depth (int): Max depth of the tree.
         tournament_size (int): The tournament size to use when performing selection.
+        steady_state (bool): Whether to evolve by incremental replacement instead of whole generations.
+        precision (numpy.dtype or None): Precision to store values in, as NumPy arrays (None for Python numbers).
+        prescreen (bool): Whether to reject equations that may divide by zero or overflow without evaluating them.
+        promote_interval (int): Generations between promotions of frequent subtrees to terminals (0 to disable).
+        pipelined (bool): Whether to evaluate offspring in the background while the next ones are bred.
+        time_budget (float or None): Seconds to evolve for, reseeding on stagnation, instead of a generation count.
+        stack_machine (bool): Whether to evaluate the whole population at once with the NumPy stack machine.
+        workers (list of str): Addresses ('host:port') of workers to distribute evaluation to (if any).
+        export_file (str or None): File to save the best individual's predictor to (if any).
+        headless (bool): Whether to skip plotting (and never import matplotlib).
+        reports (list of str): Names of the reporting sinks to send the results to (see src.reporting.SINKS).
         nucleus (Nucleus): The nucleus which manages all the chromosomes.
 
     """
@@ -51,12 +81,26 @@ class Main:
         self.functions = frozenset()
         self.max_depth = 0
         self.tournament_size = 0
+        self.steady_state = False
+        self.precision = None
+        self.prescreen = False
+        self.promote_interval = 0
+        self.pipelined = False
+        self.time_budget = None
+        self.stack_machine = False
+        self.workers = []
+        self.export_file = None
+        self.headless = False
+        self.reports = []
         self.nucleus = None
 
     def load_attributes(self):
         """
         Load in attributes from the JSON config.
 
+        Raises:
+            ValueError: If an unknown report is configured.
+
         """
         with open(VALUES_FILE) as data:
             raw = json.load(data)
@@ -67,13 +111,36 @@ class Main:
         self.values = raw['value_set']
         self.max_depth = raw['max_depth']
         self.tournament_size = raw['tournament_size']
+        if 'precision' in raw:
+            self.precision = PRECISIONS[raw['precision']]
+        self.steady_state = raw.get('steady_state', False)
+        self.prescreen = raw.get('prescreen', False)
+        self.promote_interval = raw.get('promote_interval', 0)
+        self.pipelined = raw.get('pipelined', False)
+        self.time_budget = raw.get('time_budget')
+        self.stack_machine = raw.get('stack_machine', False)
+        self.workers = raw.get('workers', [])
+        self.export_file = raw.get('export_file')
+        self.headless = raw.get('headless', False) or '--headless' in sys.argv[1:]
+        self.reports = raw.get('reports', ['plot'])
+        # Check the reports now rather than after the run, so a typo doesn't lose its results.
+        unknown = [report for report in self.reports if report not in SINKS]
+        if unknown:
+            raise ValueError('Unknown reports {0}; expected some of {1}.'.format(unknown, sorted(SINKS)))
+        # Headless runs never plot.
+        if self.headless:
+            self.reports = [report for report in self.reports if report != 'plot']
         # Create independent variable object for each.
         for var in raw['independent_variables']:
             # Get the values for that symbol.
             values = [ind_vals[var] for ind_vals in raw['independent_values']]
+            if self.precision is not None:
+                values = np.array(values, dtype=self.precision)
             ind_var = IndependentVariable(var, values)
             self.ind_vars.append(ind_var)
         self.dep_vals = raw['dependent_values']
+        if self.precision is not None:
+            self.dep_vals = np.array(self.dep_vals, dtype=self.precision)
         self.terminal_symbols = frozenset(self.values + self.ind_vars)
         function_list = [MATH_FUNCTIONS[function] for function in raw['function_set']]
         self.functions = frozenset(function_list)
@@ -101,6 +168,19 @@ class Main:
             self.dep_vals,
             self.tournament_size
         )
+        self.nucleus.prescreen = self.prescreen
+        self.nucleus.promote_interval = self.promote_interval
+        # Optional evaluators are only imported when used.
+        if self.workers:
+            from src.distributed import DistributedEvaluator, parse_address
+            self.nucleus.evaluator = DistributedEvaluator([parse_address(worker) for worker in self.workers])
+        elif self.stack_machine:
+            from src.stack_machine import StackMachineEvaluator
+            self.nucleus.evaluator = StackMachineEvaluator(
+                self.ind_vars,
+                self.dep_vals,
+                self.precision or np.float64
+            )
         self.nucleus.generate_population()
 
     def evolve(self):
@@ -111,13 +191,50 @@ class Main:
             bool: True if optimal individual found, False if not.
 
         """
+        if self.time_budget is not None:
+            return self.nucleus.evolve_timed(self.time_budget).error < ERROR_THRESHOLD
+        if self.steady_state:
+            return self.nucleus.evolve_steady_state(self.generations)
+        if self.pipelined:
+            return self.nucleus.evolve_pipelined(self.generations)
         return self.nucleus.evolve(self.generations)
 
+    def export(self):
+        """
+        Save the best individual as a standalone predictor, if an export file is configured.
+
+        """
+        if self.export_file is None:
+            return
+        from src.predictor import Predictor
+        self.nucleus.sort()
+        Predictor.from_chromosome(self.nucleus.population[0]).save(self.export_file)
+
+    def report(self):
+        """
+        Send the results to each configured reporting sink.
+
+        """
+        for report in self.reports:
+            SINKS[report]().report(self.nucleus)
+
+    def check_import_budget(self):
+        """
+        Warn if a headless run spent longer than its budget importing modules.
+
+        """
+        if self.headless and IMPORT_TIME > IMPORT_BUDGET:
+            print(
+                'Warning: imports took {0:.3f}s, over the {1}s budget.'.format(IMPORT_TIME, IMPORT_BUDGET),
+                file=sys.stderr
+            )
+
 
 if __name__ == '__main__':
     main = Main()
     # Load in from config file.
     main.load_attributes()
+    main.check_import_budget()
     # Configure the Equation Tree class.
     main.configure_equation_tree()
     # Start the nucleus.
@@ -133,4 +250,5 @@ if __name__ == '__main__':
     main.nucleus.sort()
     print('Error: ', main.nucleus.population[0].error)
     print(main.nucleus.population[0].equation.render())
-    main.nucleus.plot_learning()
+    main.export()
+    main.report()
@@ -0,0 +1,104 @@
+"""
+Benchmark of whole-population evaluation in float32 and float64 precision.
+
+Grows a seeded random population, then times the stack machine scoring it over random datasets of each size in each
+precision, and compares the median errors of the two precisions.
+
+Usage:   python3 -m src.benchmark [--population N] [--rows ROWS [ROWS ...]] [--repeat N] [--seed SEED]
+
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from src.chromosome import Chromosome
+from src.equation_tree import EquationTree
+from src.math_functions import Add, Subtract, Multiply, Divide, IndependentVariable
+from src.stack_machine import StackMachineEvaluator
+
+# Default population size and dataset sizes.
+POPULATION_SIZE = 1000
+ROWS = [10000, 200000]
+# Number of timed runs of each case (the fastest is reported).
+REPEAT = 3
+# Tree growth parameters (matching the defaults in values.json).
+FUNCTION_PROB = 4
+TERMINAL_PROB = 12
+MAX_DEPTH = 50
+# Precisions compared.
+PRECISIONS = [np.float64, np.float32]
+
+
+def grow_population(size, ind_var, seed):
+    """
+    Grow a reproducible random population.
+
+    Args:
+        size (int): The number of chromosomes.
+        ind_var (IndependentVariable): The independent variable used in the equations.
+        seed (int): The random seed.
+
+    Returns:
+        list of Chromosome: The chromosomes.
+
+    """
+    random.seed(seed)
+    # Sequences rather than sets, so sampling does not depend on hash order.
+    EquationTree.FUNCTION_SET = (Add, Subtract, Multiply, Divide)
+    EquationTree.FUNCTION_PROB = FUNCTION_PROB
+    EquationTree.TERMINAL_SET = tuple(range(-5, 6)) + (ind_var,)
+    EquationTree.TERMINAL_PROB = TERMINAL_PROB
+    EquationTree.MAX_DEPTH = MAX_DEPTH
+    population = []
+    for _ in range(size):
+        chromosome = Chromosome([ind_var], [])
+        chromosome.grow_equation_tree()
+        population.append(chromosome)
+    return population
+
+
+def benchmark(population_size=POPULATION_SIZE, rows=ROWS, repeat=REPEAT, seed=0):
+    """
+    Time the evaluation of a population in each precision and print the results.
+
+    Args:
+        population_size (int): The number of chromosomes.
+        rows (list of int): The dataset sizes.
+        repeat (int): The number of timed runs of each case.
+        seed (int): The random seed of the population and datasets.
+
+    """
+    ind_var = IndependentVariable('x', [0.0])
+    population = grow_population(population_size, ind_var, seed)
+    print('{0:>8} {1:>8} {2:>10} {3:>16}'.format('rows', 'dtype', 'seconds', 'median error'))
+    for row_cnt in rows:
+        xs = np.random.default_rng(seed).random(row_cnt)
+        medians = []
+        for dtype in PRECISIONS:
+            ind_var.vals = xs.astype(dtype)
+            evaluator = StackMachineEvaluator([ind_var], xs ** 2 / 2, dtype)
+            # Warm up, then keep the fastest run.
+            evaluator(population[:10])
+            best_time = float('inf')
+            for _ in range(repeat):
+                start = time.perf_counter()
+                errors = np.array(evaluator(population))
+                best_time = min(best_time, time.perf_counter() - start)
+            medians.append(np.median(errors[np.isfinite(errors)]))
+            print('{0:>8} {1:>8} {2:>10.3f} {3:>16.9g}'.format(row_cnt, np.dtype(dtype).name, best_time, medians[-1]))
+        print('{0:>8} relative difference of median errors: {1:.2g}'.format(
+            row_cnt,
+            abs(medians[1] - medians[0]) / medians[0]
+        ))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark float32 and float64 evaluation.')
+    parser.add_argument('--population', type=int, default=POPULATION_SIZE)
+    parser.add_argument('--rows', type=int, nargs='+', default=ROWS)
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    benchmark(args.population, args.rows, args.repeat, args.seed)
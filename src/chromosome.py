@@ -6,6 +6,7 @@ import random
 from copy import deepcopy
 
 from src.equation_tree import EquationTree
+from src.math_functions import IndependentVariable
 
 # Terminal set.
 TERMINAL = set(range(-5, 6, 1))
@@ -16,15 +17,16 @@ class Chromosome:
     For managing a programmatic solution (equation).
 
     Attributes:
-        equation (EquationTree): The root of an equation tree solution.
+        equation (EquationTree): The root of an equation tree solution (None until grown).
         ind_vars (list of IndependentVariable): The independent variables.
         dep_vars (list of int or float): The dependent variables.
         error (float): Cached score of the chromosome.
 
     """
+    __slots__ = ('equation', 'ind_vars', 'dep_vars', 'error')
 
     def __init__(self, ind_vars, dep_vars):
-        self.equation = EquationTree()
+        self.equation = None
         self.ind_vars = ind_vars
         self.dep_vars = dep_vars
         self.error = 0
@@ -52,7 +54,58 @@ class Chromosome:
 
         """
         # Grow the tree.
-        self.equation.grow()
+        self.equation = EquationTree.grow()
+
+    def replace_subtree(self, path, old_node, new_node):
+        """
+        Replace a subtree of the equation, updating the descendent counts of its ancestors.
+
+        Args:
+            path (list of tuple): The (ancestor, child index) pairs leading to the subtree from the root.
+            old_node (EquationTree): The subtree being replaced.
+            new_node (EquationTree): The subtree to put in its place.
+
+        """
+        # Replace the whole tree if the root is selected.
+        if not path:
+            self.equation = new_node
+            return
+        parent, parent_i = path[-1]
+        parent.children[parent_i] = new_node
+        delta = new_node.descendents_cnt - old_node.descendents_cnt
+        for ancestor, _ in path:
+            ancestor.descendents_cnt += delta
+
+    def substitute(self, terminals):
+        """
+        Replace subtrees of the equation with equivalent terminals, largest first.
+
+        Args:
+            terminals (dict): Mapping of the in-fix rendering of subtrees to the terminal values replacing them.
+
+        """
+        if self.equation.is_terminal:
+            return
+        keys = {id(node): key for node, key in self.equation.subtree_keys()}
+        if keys[id(self.equation)] in terminals:
+            self.equation = EquationTree.leaf(terminals[keys[id(self.equation)]])
+            return
+        # Replace matching children top-down, only descending into the children that were kept.
+        internal_nodes = []
+        stack = [self.equation]
+        while stack:
+            node = stack.pop()
+            internal_nodes.append(node)
+            for i, child in enumerate(node.children):
+                if child.is_terminal:
+                    continue
+                if keys[id(child)] in terminals:
+                    node.children[i] = EquationTree.leaf(terminals[keys[id(child)]])
+                else:
+                    stack.append(child)
+        # Recount descendents bottom-up (nodes are always listed before their descendents).
+        for node in reversed(internal_nodes):
+            node.descendents_cnt = sum(child.descendents_cnt + 1 for child in node.children)
 
     def get_error(self):
         """
@@ -62,16 +115,18 @@ class Chromosome:
             float: The chromosome's error.
 
         """
-        # Evaluate for each set of dependent variables.
+        # Flatten the tree once and evaluate it for each set of dependent variables.
+        order = self.equation.postorder()
+        used = {node.val for node in order if isinstance(node.val, IndependentVariable)}
         error = 0.0
         for i in range(len(self.dep_vars)):
-            # Update current independent variable value for each.
-            for ind_var in self.ind_vars:
+            # Update current value of each independent variable the equation uses.
+            for ind_var in used:
                 ind_var.set_current_val(i)
             # Evaluate the expression.
-            res = self.equation.evaluate()
-            # Calculate and add error.
-            error += (res - self.dep_vars[i]) ** 2
+            res = self.equation.evaluate(order)
+            # Calculate and add error (in double precision, whatever the precision of the values).
+            error += float(res - self.dep_vars[i]) ** 2
         return error
 
     def mutate(self, prob=20):
@@ -85,17 +140,9 @@ class Chromosome:
         # Exit if probability does not work out.
         if random.randint(1, prob) != 1:
             return
-        # Select random node and grow new subtree.
-        rand_node = self.equation.random_select()
-        # If root node is selected, grow a new tree.
-        if rand_node.parent is None:
-            self.equation = EquationTree()
-            self.grow_equation_tree()
-        else:
-            new_node = EquationTree()
-            rand_node.parent.children[rand_node.parent_i] = new_node
-            # Grow a new subtree.
-            new_node.grow()
+        # Select random node and grow new subtree in its place.
+        rand_node, path = self.equation.random_select()
+        self.replace_subtree(path, rand_node, EquationTree.grow(len(path)))
 
     def crossover(self, other):
         """
@@ -106,15 +153,8 @@ class Chromosome:
 
         """
         # Select a random node from both chromosomes.
-        self_node = self.equation.random_select()
-        other_node = other.equation.random_select()
-        # Move self subtree into other, handling if the root node was selected.
-        if other_node.parent is None:
-            other.equation = self_node
-        else:
-            other_node.parent.children[other_node.parent_i] = self_node
-        # Do the same for other.
-        if self_node.parent is None:
-            self.equation = other_node
-        else:
-            self_node.parent.children[self_node.parent_i] = other_node
+        self_node, self_path = self.equation.random_select()
+        other_node, other_path = other.equation.random_select()
+        # Swap the subtrees.
+        other.replace_subtree(other_path, other_node, self_node)
+        self.replace_subtree(self_path, self_node, other_node)
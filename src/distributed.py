@@ -0,0 +1,464 @@
+"""
+Distributed evaluation of chromosomes over a simple TCP worker protocol.
+
+Workers load the dataset once and score batches of compiled equations sent by a coordinator. Messages are JSON
+objects, each prefixed with its length as a 4 byte big-endian integer:
+
+    {"type": "ping"}                                                     -> {"type": "pong"}
+    {"type": "evaluate", "variables": [...], "programs": [...]}          -> {"type": "errors", "errors": [...]}
+
+A request the worker fails to serve is answered with {"type": "error", "message": "..."} instead.
+
+Usage:   python3 -m src.distributed [--host HOST] [--port PORT] [--values VALUES_FILE]
+
+"""
+import argparse
+import json
+import queue
+import socket
+import socketserver
+import struct
+import threading
+
+import numpy as np
+
+from src.math_functions import DerivedVariable
+from src.predictor import compile_tree, run_program
+
+# Default address workers listen on.
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 5757
+# Number of chromosomes sent to a worker at a time.
+BATCH_SIZE = 64
+# Seconds to wait for a worker's response before considering it dead.
+TIMEOUT = 30.0
+# Seconds to wait when connecting to a worker.
+CONNECT_TIMEOUT = 2.0
+# Seconds between heartbeats to idle workers.
+HEARTBEAT_INTERVAL = 2.0
+# Number of times a batch is sent before giving up on it.
+MAX_ATTEMPTS = 3
+# Format of the length prefix of each message.
+HEADER = struct.Struct('>I')
+
+
+def send_message(sock, message):
+    """
+    Send a length-prefixed JSON message.
+
+    Args:
+        sock (socket.socket): The socket to send over.
+        message (dict): The message.
+
+    """
+    payload = json.dumps(message, separators=(',', ':')).encode()
+    sock.sendall(HEADER.pack(len(payload)) + payload)
+
+
+def receive_message(sock):
+    """
+    Receive a length-prefixed JSON message.
+
+    Args:
+        sock (socket.socket): The socket to receive from.
+
+    Raises:
+        ConnectionError: If the connection is closed mid-message.
+
+    Returns:
+        dict: The message.
+
+    """
+    header = receive_exactly(sock, HEADER.size)
+    return json.loads(receive_exactly(sock, HEADER.unpack(header)[0]).decode())
+
+
+def receive_exactly(sock, size):
+    """
+    Receive an exact number of bytes.
+
+    Args:
+        sock (socket.socket): The socket to receive from.
+        size (int): The number of bytes.
+
+    Raises:
+        ConnectionError: If the connection is closed first.
+
+    Returns:
+        bytes: The received bytes.
+
+    """
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError('Connection closed.')
+        data += chunk
+    return data
+
+
+def load_dataset(values_file):
+    """
+    Load the independent and dependent values from a JSON config.
+
+    Args:
+        values_file (str): The config file.
+
+    Returns:
+        tuple: Mapping of independent variable symbols to value columns, and the array of dependent values, both in
+            the configured precision.
+
+    """
+    with open(values_file) as data:
+        raw = json.load(data)
+    dtype = np.dtype(raw.get('precision', 'float64'))
+    columns = {
+        var: np.array([ind_vals[var] for ind_vals in raw['independent_values']], dtype=dtype)
+        for var in raw['independent_variables']
+    }
+    return columns, np.array(raw['dependent_values'], dtype=dtype)
+
+
+def program_error(program, columns, dep_vals):
+    """
+    Calculate the squared error of a compiled equation.
+
+    Args:
+        program (list of list): The postfix program.
+        columns (list of numpy.ndarray): The value column of each independent variable.
+        dep_vals (numpy.ndarray): The dependent values.
+
+    Returns:
+        float: The squared error, or inf if the equation divides by zero.
+
+    """
+    try:
+        res = run_program(program, columns, len(dep_vals), strict=True, dtype=dep_vals.dtype.type)
+    except ZeroDivisionError:
+        return float('inf')
+    # Accumulate the error in double precision.
+    with np.errstate(over='ignore', invalid='ignore'):
+        residuals = (res - dep_vals).astype(np.float64)
+        return float(np.dot(residuals, residuals))
+
+
+class WorkerHandler(socketserver.BaseRequestHandler):
+    """
+    Serves requests from a coordinator connection until it closes.
+
+    """
+
+    def handle(self):
+        columns = self.server.columns
+        dep_vals = self.server.dep_vals
+        while True:
+            try:
+                message = receive_message(self.request)
+            except (ConnectionError, OSError):
+                return
+            try:
+                response = self.respond(message, columns, dep_vals)
+            except Exception as e:
+                # Report the failure rather than dropping the connection, which the coordinator would retry.
+                response = {'type': 'error', 'message': '{0}: {1}'.format(type(e).__name__, e)}
+            send_message(self.request, response)
+
+    @staticmethod
+    def respond(message, columns, dep_vals):
+        """
+        Serve a single request.
+
+        Args:
+            message (dict): The request.
+            columns (dict): Mapping of independent variable symbols to value columns.
+            dep_vals (numpy.ndarray): The dependent values.
+
+        Raises:
+            ValueError: If the request type is unknown.
+
+        Returns:
+            dict: The response.
+
+        """
+        if message['type'] == 'ping':
+            return {'type': 'pong'}
+        if message['type'] == 'evaluate':
+            ordered = [columns[var] for var in message['variables']]
+            errors = [program_error(program, ordered, dep_vals) for program in message['programs']]
+            return {'type': 'errors', 'errors': errors}
+        raise ValueError('Unknown request type {0}.'.format(message['type']))
+
+
+class Worker(socketserver.ThreadingTCPServer):
+    """
+    A TCP server which holds the dataset and scores compiled equations.
+
+    Attributes:
+        columns (dict): Mapping of independent variable symbols to value columns.
+        dep_vals (numpy.ndarray): The dependent values.
+
+    """
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address, columns, dep_vals):
+        super().__init__(address, WorkerHandler)
+        self.columns = columns
+        self.dep_vals = dep_vals
+
+
+class WorkerConnection:
+    """
+    The coordinator's connection to a single worker.
+
+    Attributes:
+        address (tuple): The (host, port) of the worker.
+        timeout (float): Seconds to wait for a response.
+        connect_timeout (float): Seconds to wait when connecting.
+        sock (socket.socket or None): The open socket, or None if the worker is considered dead.
+        lock (threading.Lock): Serializes requests over the socket.
+
+    """
+
+    def __init__(self, address, timeout=TIMEOUT, connect_timeout=CONNECT_TIMEOUT):
+        self.address = address
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.sock = None
+        self.lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        """
+        bool: Whether the worker is connected (not considered dead).
+
+        """
+        return self.sock is not None
+
+    def connect(self):
+        """
+        Connect to the worker if not already connected.
+
+        The lock is only taken once connected, so requests to the worker are never held up by an unreachable host.
+
+        Returns:
+            bool: True if connected, False if the worker could not be reached.
+
+        """
+        if self.is_open:
+            return True
+        try:
+            sock = socket.create_connection(self.address, timeout=self.connect_timeout)
+        except OSError:
+            return False
+        sock.settimeout(self.timeout)
+        with self.lock:
+            if self.sock is None:
+                self.sock = sock
+            else:
+                sock.close()
+        return True
+
+    def close(self):
+        """
+        Close the connection, marking the worker as dead (the lock must be held).
+
+        """
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def request(self, message):
+        """
+        Send a message and wait for the response.
+
+        Args:
+            message (dict): The message.
+
+        Raises:
+            OSError: If the worker is dead or did not respond, in which case the connection is closed.
+
+        Returns:
+            dict: The response.
+
+        """
+        with self.lock:
+            if self.sock is None:
+                raise ConnectionError('Worker {0}:{1} is dead.'.format(*self.address))
+            try:
+                send_message(self.sock, message)
+                return receive_message(self.sock)
+            except OSError:
+                self.close()
+                raise
+
+
+class DistributedEvaluator:
+    """
+    Evaluates chromosomes on remote workers, re-dispatching batches of workers that die.
+
+    Instances are used as a Nucleus evaluator. Batches are only sent to open connections; dead workers are reconnected
+    by the heartbeat, so an unreachable host never delays an evaluation.
+
+    Attributes:
+        connections (list of WorkerConnection): The connections to each worker.
+        batch_size (int): The number of chromosomes sent to a worker at a time.
+        heartbeat_interval (float): Seconds between heartbeats.
+        stopped (threading.Event): Set to stop the heartbeat.
+        heartbeat (threading.Thread): Background thread which pings idle workers and reconnects dead ones.
+
+    """
+
+    def __init__(self, addresses, batch_size=BATCH_SIZE, timeout=TIMEOUT, connect_timeout=CONNECT_TIMEOUT,
+                 heartbeat_interval=HEARTBEAT_INTERVAL):
+        self.connections = [WorkerConnection(address, timeout, connect_timeout) for address in addresses]
+        self.batch_size = batch_size
+        self.heartbeat_interval = heartbeat_interval
+        # Connect up front so the first evaluation has workers to send to.
+        for connection in self.connections:
+            connection.connect()
+        self.stopped = threading.Event()
+        self.heartbeat = threading.Thread(target=self.beat, daemon=True)
+        self.heartbeat.start()
+
+    def __call__(self, chromosomes):
+        """
+        Calculate the error of each chromosome.
+
+        Args:
+            chromosomes (list of Chromosome): The chromosomes to evaluate.
+
+        Raises:
+            ConnectionError: If every worker is dead, or a batch was lost by MAX_ATTEMPTS workers.
+            RuntimeError: If a worker failed to evaluate a batch.
+
+        Returns:
+            list of float: The error of each chromosome.
+
+        """
+        if not chromosomes:
+            return []
+        # Workers only hold the original columns, so derived variables are sent as their subexpressions.
+        variables = [
+            ind_var.symbol for ind_var in chromosomes[0].ind_vars if not isinstance(ind_var, DerivedVariable)
+        ]
+        programs = [compile_tree(chromosome.equation, variables) for chromosome in chromosomes]
+        batches = queue.Queue()
+        for start in range(0, len(programs), self.batch_size):
+            batches.put(start)
+        errors = [None] * len(programs)
+        attempts = [0] * len(programs)
+        failures = []
+        # Batches of workers that die are put back, so keep going while any remain.
+        while not batches.empty():
+            live = [connection for connection in self.connections if connection.is_open]
+            if not live:
+                raise ConnectionError('No workers available.')
+            threads = [
+                threading.Thread(
+                    target=self.dispatch,
+                    args=(connection, variables, programs, batches, errors, attempts, failures)
+                )
+                for connection in live
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            if failures:
+                raise failures[0]
+        return errors
+
+    def dispatch(self, connection, variables, programs, batches, errors, attempts, failures):
+        """
+        Send batches to a worker until none remain, the worker dies or any batch fails.
+
+        Args:
+            connection (WorkerConnection): The worker's connection.
+            variables (list of str): The independent variable symbols referenced by the programs.
+            programs (list of list): The compiled equations.
+            batches (queue.Queue): Start indices of batches still to evaluate.
+            errors (list of float): Errors of each program, filled in as batches complete.
+            attempts (list of int): Number of times each batch has been sent, indexed by its start.
+            failures (list of Exception): Errors which end the evaluation, appended to as they occur.
+
+        """
+        while not failures:
+            try:
+                start = batches.get_nowait()
+            except queue.Empty:
+                return
+            end = start + self.batch_size
+            attempts[start] += 1
+            try:
+                response = connection.request({
+                    'type': 'evaluate',
+                    'variables': variables,
+                    'programs': programs[start:end]
+                })
+            except OSError as e:
+                if attempts[start] >= MAX_ATTEMPTS:
+                    failures.append(ConnectionError(
+                        'Batch {0} was lost by {1} workers: {2}'.format(start // self.batch_size, attempts[start], e)
+                    ))
+                else:
+                    # Worker died, so leave its batch for the remaining workers.
+                    batches.put(start)
+                return
+            if response['type'] == 'error':
+                host, port = connection.address
+                failures.append(RuntimeError('Worker {0}:{1} failed: {2}'.format(host, port, response['message'])))
+                return
+            errors[start:end] = response['errors']
+
+    def beat(self):
+        """
+        Periodically ping idle workers so dead ones are detected, and try to reconnect dead ones.
+
+        """
+        while not self.stopped.wait(self.heartbeat_interval):
+            for connection in self.connections:
+                if not connection.is_open:
+                    connection.connect()
+                # Busy workers are being heard from already.
+                elif not connection.lock.locked():
+                    try:
+                        connection.request({'type': 'ping'})
+                    except OSError:
+                        pass
+
+    def close(self):
+        """
+        Stop the heartbeat and close every connection.
+
+        """
+        self.stopped.set()
+        for connection in self.connections:
+            with connection.lock:
+                connection.close()
+
+
+def parse_address(address):
+    """
+    Parse a 'host:port' string.
+
+    Args:
+        address (str): The address.
+
+    Returns:
+        tuple: The (host, port) pair.
+
+    """
+    host, port = address.rsplit(':', 1)
+    return host, int(port)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve chromosome evaluation to a coordinator.')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--values', default='values.json')
+    args = parser.parse_args()
+    # Load the dataset once and serve until interrupted.
+    worker = Worker((args.host, args.port), *load_dataset(args.values))
+    worker.serve_forever()
@@ -2,30 +2,31 @@
 For managing a tree data structure representing equations.
 
 """
+import math
 import random
-from copy import deepcopy
 
-from src.math_functions import Add, Subtract, Multiply, Divide, IndependentVariable
+from src.math_functions import Add, Subtract, Multiply, Divide, DerivedVariable, IndependentVariable
 
 
 class EquationTree:
     """
     For representing equations as trees.
 
+    Terminal leaves are immutable and shared between trees (see leaf), so nodes do not track their parent or depth;
+    position information is returned by random_select instead.
+
     Attributes:
-        val (int or float): The value at this node (if applicable).
+        val (int or float or IndependentVariable): The value at this node (if applicable).
         op (Add or Subtract or Multiply or Divide): The operator performed at this node (if applicable).
         descendents_cnt (int): The number of descendents of this node.
-        children (list of EquationTree): The children of this node.
+        children (list of EquationTree): The children of this node (an empty tuple for terminal leaves).
         is_terminal (bool): Whether the node is terminal or not.
-        parent (EquationTree): The parent of this node.
-        parent_i (int): The index of this child in the parent's children list.
-        depth (int): The depth of this node.
 
     Notes:
         TERMINAL_SET, FUNCTION_SET, and
 
     """
+    __slots__ = ('val', 'op', 'descendents_cnt', 'children', 'is_terminal')
     # Possible terminal items and probability of being selected for a node.
     TERMINAL_SET = frozenset()
     TERMINAL_PROB = 0
@@ -34,6 +35,8 @@ class EquationTree:
     FUNCTION_PROB = 0
     # Max Tree depth.
     MAX_DEPTH = 0
+    # Shared terminal leaves, keyed by the type and value of the terminal.
+    LEAVES = {}
 
     def __init__(self):
         self.val = None
@@ -41,9 +44,6 @@ class EquationTree:
         self.descendents_cnt = 0
         self.children = []
         self.is_terminal = False
-        self.parent = None
-        self.parent_i = None
-        self.depth = 0
 
     def __str__(self):
         """
@@ -60,21 +60,109 @@ class EquationTree:
 
     def __deepcopy__(self, memodict=None):
         """
-        Recursively deepcopy the subtree.
+        Deepcopy the subtree without recursion, sharing the immutable terminal leaves.
 
         Returns: Deep copied subtree.
 
         """
-        new_node = EquationTree()
-        new_node.val = self.val
-        new_node.op = self.op
-        new_node.descendents_cnt = self.descendents_cnt
-        new_node.is_terminal = self.is_terminal
-        new_node.parent = self.parent
-        new_node.parent_i = self.parent_i
-        new_node.depth = self.depth
-        new_node.children = [deepcopy(child) for child in self.children]
-        return new_node
+        if self.is_terminal:
+            return self
+        new_root = EquationTree()
+        # Pairs of original internal nodes and their copies whose children still need copying.
+        stack = [(self, new_root)]
+        while stack:
+            node, new_node = stack.pop()
+            new_node.op = node.op
+            new_node.descendents_cnt = node.descendents_cnt
+            for child in node.children:
+                if child.is_terminal:
+                    new_node.children.append(child)
+                else:
+                    new_child = EquationTree()
+                    new_node.children.append(new_child)
+                    stack.append((child, new_child))
+        return new_root
+
+    def __reduce__(self):
+        """
+        Pickle the subtree as its flat post-order, so deep trees do not exceed the recursion limit.
+
+        Returns:
+            tuple: The function rebuilding the subtree and its arguments.
+
+        """
+        return EquationTree.from_postfix, (self.to_postfix(),)
+
+    def to_postfix(self, symbols=False):
+        """
+        Flatten the subtree into a postfix program without recursion.
+
+        Args:
+            symbols (bool): Whether to list independent variables by symbol rather than by value.
+
+        Returns:
+            list of tuple: The program. Each instruction is ('leaf', value), ('var', symbol) or ('op', operator).
+
+        """
+        program = []
+        for node in self.postorder():
+            if not node.is_terminal:
+                program.append(('op', node.op))
+            elif symbols and isinstance(node.val, IndependentVariable):
+                program.append(('var', node.val.symbol))
+            else:
+                program.append(('leaf', node.val))
+        return program
+
+    @staticmethod
+    def from_postfix(program, variables=None):
+        """
+        Rebuild a subtree from a postfix program without recursion.
+
+        Args:
+            program (list of tuple): The program (see to_postfix).
+            variables (dict): Mapping of symbols to independent variables (needed if the program lists any by symbol).
+
+        Returns:
+            EquationTree: The root of the subtree.
+
+        """
+        stack = []
+        for kind, arg in program:
+            if kind == 'op':
+                node = EquationTree()
+                node.init_internal(arg)
+                # The operands are the last entries, in order.
+                node.children = stack[-arg.PARAM_CNT:]
+                del stack[-arg.PARAM_CNT:]
+                node.descendents_cnt = sum(child.descendents_cnt + 1 for child in node.children)
+                stack.append(node)
+            elif kind == 'var':
+                stack.append(EquationTree.leaf(variables[arg]))
+            else:
+                stack.append(EquationTree.leaf(arg))
+        return stack[0]
+
+    @staticmethod
+    def leaf(val):
+        """
+        Get the shared terminal leaf for a value, creating it if needed.
+
+        Args:
+            val (int or float or IndependentVariable): The value at the leaf.
+
+        Returns:
+            EquationTree: The shared leaf.
+
+        """
+        key = (type(val), val)
+        node = EquationTree.LEAVES.get(key)
+        if node is None:
+            node = EquationTree()
+            node.init_terminal(val)
+            node.children = ()
+            EquationTree.LEAVES[key] = node
+        return node
 
     def init_terminal(self, val):
         """
@@ -116,75 +204,188 @@ class EquationTree:
         # Else, pick terminal symbol.
         return True
 
-    def grow(self):
+    @staticmethod
+    def grow(depth=0):
         """
-        Randomly grow a subtree.
+        Randomly grow a new subtree without recursion.
+
+        Args:
+            depth (int): The depth of the root of the subtree.
 
         Returns:
-            int: The number of descendents of the subtree, including self.
+            EquationTree: The root of the subtree (a shared leaf if a terminal symbol was picked).
 
         """
-        self.descendents_cnt = 0
-        # Set the depth of the node.
-        if self.parent is not None:
-            self.depth = self.parent.depth + 1
-        # Pick either a terminal or function symbol (must choose terminal if max depth exceeded).
-        if self.pick_terminal() or self.depth >= EquationTree.MAX_DEPTH:
-            rand_select = random.sample(EquationTree.TERMINAL_SET, 1)[0]
-            self.init_terminal(rand_select)
-            return 1
-        rand_select = random.sample(EquationTree.FUNCTION_SET, 1)[0]
-        self.init_internal(rand_select)
-        # Generate children.
-        for i in range(self.op.PARAM_CNT):
-            new_child = EquationTree()
-            new_child.parent = self
-            new_child.parent_i = i
-            self.children.append(new_child)
-            self.descendents_cnt += new_child.grow()
-        return self.descendents_cnt + 1
+        root = [None]
+        internal_nodes = []
+        # Slots to fill as (children list, index, depth), popped in pre-order so the first child is grown first.
+        stack = [(root, 0, depth)]
+        while stack:
+            children, i, node_depth = stack.pop()
+            # Pick either a terminal or function symbol (must choose terminal if max depth exceeded).
+            if EquationTree.pick_terminal() or node_depth >= EquationTree.MAX_DEPTH:
+                rand_select = random.sample(EquationTree.TERMINAL_SET, 1)[0]
+                children[i] = EquationTree.leaf(rand_select)
+                continue
+            rand_select = random.sample(EquationTree.FUNCTION_SET, 1)[0]
+            node = EquationTree()
+            node.init_internal(rand_select)
+            node.children = [None] * node.op.PARAM_CNT
+            children[i] = node
+            internal_nodes.append(node)
+            # Generate children.
+            stack.extend((node.children, j, node_depth + 1) for j in reversed(range(node.op.PARAM_CNT)))
+        # Count descendents bottom-up (nodes are always listed before their descendents).
+        for node in reversed(internal_nodes):
+            node.descendents_cnt = sum(child.descendents_cnt + 1 for child in node.children)
+        return root[0]
 
     def random_select(self):
         """
-        Randomly select a node from descendents.
+        Randomly select a node from descendents, each with equal probability.
 
         Returns:
-            EquationTree: Randomly selected node.
-
-        """
-        # Number of descendents for each child (including the child).
-        ind_desc = [child.descendents_cnt + 1 for child in self.children]
-        # Make accumulative list of individual descendents so the last entry is the total.
-        desc_accum = []
-        total = 0
-        for desc in ind_desc:
-            desc_accum.append(desc + total)
-            total += desc
-        # Randomly select a number between 0 (representing this node) and the total.
-        rand_val = random.randint(0, total)
-        # Select self if 0.
-        if rand_val == 0:
-            return self
-        # Find the node to select.
-        for i in range(len(self.children) - 1):
-            if rand_val <= desc_accum[i]:
-                return self.children[i].random_select()
-        return self.children[-1].random_select()
+            tuple: The randomly selected node and the (ancestor, child index) pairs leading to it from the root.
 
-    def evaluate(self):
+        """
+        node = self
+        path = []
+        while True:
+            # Randomly select a number between 0 (representing this node) and the number of descendents.
+            rand_val = random.randint(0, node.descendents_cnt)
+            # Select the node if 0.
+            if rand_val == 0:
+                return node, path
+            # Else, descend into the child whose span of descendents contains the number.
+            for i, child in enumerate(node.children):
+                rand_val -= child.descendents_cnt + 1
+                if rand_val <= 0:
+                    path.append((node, i))
+                    node = child
+                    break
+
+    def postorder(self):
+        """
+        List the nodes of the subtree in post-order without recursion.
+
+        Returns:
+            list of EquationTree: The nodes, each child before its parent and children in order.
+
+        """
+        # Visit each node before its children, last child first, then reverse the visit order.
+        order = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            stack.extend(node.children)
+        order.reverse()
+        return order
+
+    def fold(self, terminal, internal):
+        """
+        Combine the subtree bottom-up without recursion.
+
+        Args:
+            terminal (callable): Maps a terminal node to its result.
+            internal (callable): Maps an internal node and the list of its children's results to its result.
+
+        Returns: The result for the subtree.
+
+        """
+        results = []
+        for node in self.postorder():
+            if node.is_terminal:
+                results.append(terminal(node))
+            else:
+                # Children's results are the last entries, in order.
+                cnt = len(node.children)
+                args = results[-cnt:]
+                del results[-cnt:]
+                results.append(internal(node, args))
+        return results[0]
+
+    def evaluate(self, order=None):
         """
         Evaluate a subtree.
 
+        Args:
+            order (list of EquationTree): The subtree's post-order, to reuse across evaluations (optional).
+
         Returns: The numerical result of evaluation.
 
         """
-        if isinstance(self.val, IndependentVariable):
-            return self.val.cur_val
-        if self.is_terminal:
-            return self.val
-        # Evaluate.
-        vals = [child.evaluate() for child in self.children]
-        return self.op.eval(vals)
+        if order is None:
+            order = self.postorder()
+        results = []
+        for node in order:
+            if node.is_terminal:
+                if isinstance(node.val, IndependentVariable):
+                    results.append(node.val.cur_val)
+                else:
+                    results.append(node.val)
+            else:
+                cnt = len(node.children)
+                args = results[-cnt:]
+                del results[-cnt:]
+                results.append(node.op.eval(args))
+        return results[0]
+
+    def interval(self):
+        """
+        Get the interval of possible results of the subtree over the bounds of the independent variables.
+
+        Raises:
+            ZeroDivisionError: If a divisor's interval contains zero.
+
+        Returns:
+            tuple: The least and greatest possible results (conservative).
+
+        """
+        return self.fold(
+            lambda node: node.val.bounds if isinstance(node.val, IndependentVariable) else (node.val, node.val),
+            lambda node, intervals: node.op.eval_interval(intervals)
+        )
+
+    def is_bounded(self):
+        """
+        Check whether the subtree is defined and finite over the bounds of the independent variables.
+
+        Interval arithmetic is conservative, so some defined subtrees whose subexpressions are correlated (such as
+        (1 / ((x - x) + 1))) are also reported as unbounded.
+
+        Returns:
+            bool: False if the subtree may divide by zero or overflow somewhere in the input domain.
+
+        """
+        try:
+            low, high = self.interval()
+        except (ZeroDivisionError, OverflowError):
+            return False
+        return math.isfinite(low) and math.isfinite(high)
+
+    def subtree_keys(self):
+        """
+        Render every internal node of the subtree using in-fix notation.
+
+        Returns:
+            list of tuple: The (node, in-fix rendering) of each internal node, in post-order.
+
+        """
+        rendered = []
+        keys = []
+        for node in self.postorder():
+            if isinstance(node.val, IndependentVariable):
+                rendered.append(node.val.symbol)
+            elif node.is_terminal:
+                rendered.append(node.val)
+            else:
+                cnt = len(node.children)
+                key = node.op.render(rendered[-cnt:])
+                del rendered[-cnt:]
+                rendered.append(key)
+                keys.append((node, key))
+        return keys
 
     def render_latex(self):
         """
@@ -193,12 +394,18 @@ class EquationTree:
         Returns: Latex code for expression subtree.
 
         """
-        if isinstance(self.val, IndependentVariable):
-            return self.val.symbol
-        if self.is_terminal:
-            return self.val
-        rendered = [child.render_latex() for child in self.children]
-        return self.op.render_latex(rendered)
+        def render_terminal(node):
+            # Derived variables are rendered as the subexpression they stand for.
+            if isinstance(node.val, DerivedVariable):
+                return node.val.expression.render_latex()
+            if isinstance(node.val, IndependentVariable):
+                return node.val.symbol
+            return node.val
+
+        return self.fold(
+            render_terminal,
+            lambda node, rendered: node.op.render_latex(rendered)
+        )
 
     def render(self):
         """
@@ -208,9 +415,7 @@ class EquationTree:
             str: The equation in in-fix notation.
 
         """
-        if isinstance(self.val, IndependentVariable):
-            return self.val.symbol
-        if self.is_terminal:
-            return self.val
-        rendered = [child.render() for child in self.children]
-        return self.op.render(rendered)
+        return self.fold(
+            lambda node: node.val.symbol if isinstance(node.val, IndependentVariable) else node.val,
+            lambda node, rendered: node.op.render(rendered)
+        )
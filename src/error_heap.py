@@ -0,0 +1,105 @@
+"""
+Indexed heap structure over population errors for steady-state evolution.
+
+"""
+import heapq
+
+
+class ErrorHeap:
+    """
+    Tracks the error of each population slot, allowing O(log n) lookup of the best and worst slots.
+
+    Stale heap entries are invalidated lazily using a per-slot version counter.
+
+    Attributes:
+        errors (list of float): The current error of each slot.
+        versions (list of int): The current version of each slot.
+        best_heap (list of tuple): Min heap of (error, slot, version) entries.
+        worst_heap (list of tuple): Max heap of (-error, slot, version) entries.
+
+    """
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.versions = [0] * len(self.errors)
+        self.best_heap = [(error, i, 0) for i, error in enumerate(self.errors)]
+        self.worst_heap = [(-error, i, 0) for i, error in enumerate(self.errors)]
+        heapq.heapify(self.best_heap)
+        heapq.heapify(self.worst_heap)
+
+    def __len__(self):
+        return len(self.errors)
+
+    def update(self, slot, error):
+        """
+        Update the error of a slot.
+
+        Args:
+            slot (int): The slot to update.
+            error (float): The new error of the slot.
+
+        """
+        self.errors[slot] = error
+        self.versions[slot] += 1
+        version = self.versions[slot]
+        heapq.heappush(self.best_heap, (error, slot, version))
+        heapq.heappush(self.worst_heap, (-error, slot, version))
+        # Rebuild once stale entries dominate to keep the heaps bounded.
+        if len(self.best_heap) > 4 * len(self.errors):
+            self.compact()
+
+    def compact(self):
+        """
+        Rebuild both heaps without stale entries.
+
+        """
+        self.best_heap = [(error, i, self.versions[i]) for i, error in enumerate(self.errors)]
+        self.worst_heap = [(-error, i, self.versions[i]) for i, error in enumerate(self.errors)]
+        heapq.heapify(self.best_heap)
+        heapq.heapify(self.worst_heap)
+
+    def _peek(self, heap):
+        """
+        Discard stale entries from the top of a heap and return the top slot.
+
+        Args:
+            heap (list of tuple): The heap to peek into.
+
+        Returns:
+            int: The slot at the top of the heap.
+
+        """
+        while heap[0][2] != self.versions[heap[0][1]]:
+            heapq.heappop(heap)
+        return heap[0][1]
+
+    def best(self):
+        """
+        Get the slot with the least error.
+
+        Returns:
+            int: The best slot.
+
+        """
+        return self._peek(self.best_heap)
+
+    def worst(self, exclude=()):
+        """
+        Get the slot with the greatest error.
+
+        Args:
+            exclude (collection of int): Slots that must not be returned.
+
+        Returns:
+            int: The worst slot not in exclude.
+
+        """
+        # Temporarily pop excluded slots off the top, then restore them.
+        skipped = []
+        slot = self._peek(self.worst_heap)
+        while slot in exclude:
+            skipped.append(heapq.heappop(self.worst_heap))
+            slot = self._peek(self.worst_heap)
+        for entry in skipped:
+            heapq.heappush(self.worst_heap, entry)
+        return slot
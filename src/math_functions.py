@@ -12,13 +12,16 @@ class IndependentVariable:
         symbol (str): The symbol for the variable.
         vals (tuple of int or float): The possible values of this independent variable.
         cur_val (int or float): The current value of the variable.
+        bounds (tuple of float): The least and greatest possible values of the variable.
 
     """
+    __slots__ = ('symbol', 'vals', 'cur_val', 'bounds')
 
     def __init__(self, symbol, vals):
         self.symbol = symbol
         self.vals = vals
         self.cur_val = vals[0]
+        self.bounds = (float(min(vals)), float(max(vals)))
 
     def set_current_val(self, ind):
         """
@@ -31,6 +34,21 @@ class IndependentVariable:
         self.cur_val = self.vals[ind]
 
 
+class DerivedVariable(IndependentVariable):
+    """
+    A variable holding the precomputed values of a frequent subexpression, used as a terminal in its place.
+
+    Attributes:
+        expression (EquationTree): The subexpression whose values the variable holds.
+
+    """
+    __slots__ = ('expression',)
+
+    def __init__(self, symbol, vals, expression):
+        super().__init__(symbol, vals)
+        self.expression = expression
+
+
 class Add:
     """
     For adding two arguments.
@@ -54,6 +72,19 @@ class Add:
         """
         return args[0] + args[1]
 
+    @staticmethod
+    def eval_interval(args):
+        """
+        Get the interval of possible results of addition.
+
+        Args:
+            args (list of tuple): The (least, greatest) possible values of each argument.
+
+        Returns: Result interval
+
+        """
+        return args[0][0] + args[1][0], args[0][1] + args[1][1]
+
     @staticmethod
     def render_latex(args):
         """
@@ -110,6 +141,19 @@ class Subtract:
         """
         return args[0] - args[1]
 
+    @staticmethod
+    def eval_interval(args):
+        """
+        Get the interval of possible results of subtraction.
+
+        Args:
+            args (list of tuple): The (least, greatest) possible values of each argument.
+
+        Returns: Result interval
+
+        """
+        return args[0][0] - args[1][1], args[0][1] - args[1][0]
+
     @staticmethod
     def render_latex(args):
         """
@@ -166,6 +210,20 @@ class Multiply:
         """
         return args[0] * args[1]
 
+    @staticmethod
+    def eval_interval(args):
+        """
+        Get the interval of possible results of multiplication.
+
+        Args:
+            args (list of tuple): The (least, greatest) possible values of each argument.
+
+        Returns: Result interval
+
+        """
+        products = [lo * hi for lo in args[0] for hi in args[1]]
+        return min(products), max(products)
+
     @staticmethod
     def render_latex(args):
         """
@@ -232,6 +290,22 @@ class Divide:
         """
         return args[0] / args[1]
 
+    @staticmethod
+    def eval_interval(args):
+        """
+        Get the interval of possible results of division.
+
+        Args:
+            args (list of tuple): The (least, greatest) possible values of each argument.
+
+        Returns: Result interval
+
+        """
+        # Division is undefined if the divisor can be zero.
+        if args[1][0] <= 0 <= args[1][1]:
+            raise ZeroDivisionError('Divisor interval contains zero.')
+        return Multiply.eval_interval([args[0], (1 / args[1][1], 1 / args[1][0])])
+
     @staticmethod
     def render_latex(args):
         """
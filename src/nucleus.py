@@ -3,17 +3,80 @@ Module for managing the population of chromosomes.
 
 """
 
-import os.path
 import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
 from copy import deepcopy
-from datetime import datetime
+from functools import partial
 
-import matplotlib.pyplot as plt
+import numpy as np
 
 from src.chromosome import Chromosome
+from src.equation_tree import EquationTree
+from src.error_heap import ErrorHeap
+from src.math_functions import DerivedVariable, IndependentVariable
+from src.reporting import PlotSink
+
+# Error below which an individual is considered ideal.
+ERROR_THRESHOLD = 1.0e-5
+# Generations without relative improvement of at least STAGNATION_TOLERANCE before a timed run reseeds.
+STAGNATION_PATIENCE = 20
+STAGNATION_TOLERANCE = 1.0e-3
+# Weight of the latest generation when smoothing the measured cost per generation.
+COST_SMOOTHING = 0.3
+# Number of chromosomes scored between deadline checks when a timed run scores its initial population.
+TIMED_CHUNK_SIZE = 256
+# Number of offspring per evaluation task in pipelined evolution.
+PIPELINE_CHUNK_SIZE = 32
+# Fraction of offspring evaluation tasks which must finish before the next pipelined generation starts.
+READY_FRACTION = 0.5
+# Max number of subtrees promoted to terminals at a time, the least fraction of the population a subtree must appear in
+# to be promoted, and the size range (in nodes) of subtrees considered.
+PROMOTE_COUNT = 3
+PROMOTE_FREQUENCY = 0.2
+PROMOTE_MIN_SIZE = 3
+PROMOTE_MAX_SIZE = 15
+# Max number of promoted subtrees in use at once.
+MAX_DERIVED = 12
+# Dataset of an evaluation process, installed once by init_process.
+PROCESS_DATASET = {}
+
+
+def init_process(ind_vars, dep_vars):
+    """
+    Install the dataset in an evaluation process, so chunks only need to carry equations.
+
+    Args:
+        ind_vars (list of IndependentVariable): The independent variables.
+        dep_vars (list): Dependent variable values.
 
-# Directory to save plots.
-PLOT_DIR = 'plots'
+    """
+    PROCESS_DATASET['ind_vars'] = ind_vars
+    PROCESS_DATASET['variables'] = {ind_var.symbol: ind_var for ind_var in ind_vars}
+    PROCESS_DATASET['dep_vars'] = dep_vars
+
+
+def score_chunk(programs, prescreen=False):
+    """
+    Calculate the errors of a chunk of equations against the installed dataset (in evaluation processes).
+
+    Args:
+        programs (list of list): The postfix program of each equation, listing variables by symbol.
+        prescreen (bool): Whether to reject chromosomes which are not bounded without evaluating them.
+
+    Returns:
+        list of float: The error of each equation.
+
+    """
+    chromosomes = []
+    for program in programs:
+        chromosome = Chromosome(PROCESS_DATASET['ind_vars'], PROCESS_DATASET['dep_vars'])
+        chromosome.equation = EquationTree.from_postfix(program, PROCESS_DATASET['variables'])
+        chromosomes.append(chromosome)
+    defined = Nucleus.screen(chromosomes) if prescreen else chromosomes
+    for chromosome in defined:
+        Nucleus.evaluate_chromosome(chromosome)
+    return [chromosome.error for chromosome in chromosomes]
 
 
 class Nucleus:
@@ -23,10 +86,16 @@ class Nucleus:
     Attributes:
         population_size (int): The size of the population (must be divisible by 4).
         population (list of Chromosome)
+        errors (numpy.ndarray): The error of each chromosome in the population, by position.
         ind_vars (list): The independent variables.
         dep_vars (list): Dependent variable values.
         samples (list): Sample of the best individual of each generation.
         tournament_size (int): The tournament size to use when performing the selection process.
+        rng (numpy.random.Generator): Random generator for batched selection, seeded from the random module.
+        evaluator (callable or None): Maps a list of chromosomes to their errors, replacing local evaluation if set.
+        prescreen (bool): Whether to give chromosomes that may divide by zero or overflow an infinite error without
+            evaluating them (see EquationTree.is_bounded).
+        promote_interval (int): Generations between promotions of frequent subtrees to terminals (0 to disable).
 
     """
 
@@ -41,17 +110,22 @@ class Nucleus:
             raise ValueError('Population size not divisible by 4.')
         self.population_size = population_size
         self.population = []
+        self.errors = np.zeros(0)
         self.ind_vars = ind_vars
         self.dep_vars = dep_vars
         self.samples = []
         self.tournament_size = tournament_size
+        self.rng = np.random.default_rng(random.getrandbits(64))
+        self.evaluator = None
+        self.prescreen = False
+        self.promote_interval = 0
 
     def generate_population(self):
         """
-        Generate the population of Chromosomes.
+        Generate the population of Chromosomes, filling the population up to its size.
 
         """
-        for i in range(self.population_size):
+        for i in range(self.population_size - len(self.population)):
             new_chromosome = Chromosome(
                 self.ind_vars,
                 self.dep_vars
@@ -76,56 +150,535 @@ class Nucleus:
             self.reproduce()
             # Find the best individual.
             self.calculate_error()
-            best = min(self.population, key=lambda x: x.error)
+            best_error = self.errors.min()
             # Add best error to samples.
-            self.samples.append(best.error)
+            self.samples.append(best_error)
             # If best is below threshold, exit.
-            if best.error < 1.0e-5:
+            if best_error < ERROR_THRESHOLD:
                 return True
+            self.maybe_promote(i)
+        return False
+
+    def evolve_steady_state(self, generations):
+        """
+        Evolve the nucleus by incremental replacement, stopping as soon as the error drops below a threshold.
+
+        Each generation is the same number of offspring as a generational reproduction (half the population),
+        but offspring replace the worst individuals in place as soon as they are evaluated.
+
+        Args:
+            generations (int): The number of generations worth of offspring to produce.
+
+        Returns:
+            bool: True if error dropped below threshold, False if not.
+
+        """
+        self.calculate_error()
+        heap = ErrorHeap(self.errors.tolist())
+        for i in range(generations):
+            for j in range(self.population_size // 4):
+                self.steady_state_step(heap)
+                # Best individual is known after every step, so exit as early as possible.
+                if heap.errors[heap.best()] < ERROR_THRESHOLD:
+                    self.samples.append(heap.errors[heap.best()])
+                    return True
+            # Add best error to samples.
+            self.samples.append(heap.errors[heap.best()])
+            self.maybe_promote(i)
         return False
 
+    def steady_state_step(self, heap):
+        """
+        Produce two offspring and replace the worst individuals in place if the offspring are better.
+
+        Args:
+            heap (ErrorHeap): Heap tracking the error of each population slot.
+
+        """
+        # Perform the tournament selection process.
+        winners = self.tournament(self.tournament_size)
+        child_1, child_2 = self.breed(winners)
+        # Evaluate only the offspring and replace the worst individuals.
+        self.score([child_1, child_2])
+        replaced = []
+        for child in (child_1, child_2):
+            slot = heap.worst(exclude=replaced)
+            if child.error < heap.errors[slot]:
+                self.population[slot] = child
+                self.errors[slot] = child.error
+                heap.update(slot, child.error)
+                replaced.append(slot)
+
+    def evolve_timed(self, time_budget, patience=STAGNATION_PATIENCE):
+        """
+        Evolve the nucleus until a wall-clock deadline, reseeding the population when progress stalls.
+
+        Whole generations are only started while they are expected to finish before the deadline (based on the
+        measured cost of previous generations, or of scoring the initial population before the first one); the
+        remaining time is spent on steady-state steps. Reseeding is skipped while a generation no longer fits in the
+        remaining time. If even the initial population cannot be scored in time, the unscored rest is given an
+        infinite error.
+
+        Args:
+            time_budget (float): The number of seconds to evolve for.
+            patience (int): The number of generations without improvement before reseeding.
+
+        Returns:
+            Chromosome: The best individual found, which is also kept in the population.
+
+        """
+        start = time.monotonic()
+        deadline = start + time_budget
+        scored = self.score_until(deadline)
+        # A generation scores the population twice (see reproduce), so estimate the first from the initial scoring.
+        generation_cost = 2 * (time.monotonic() - start) * len(self.population) / scored
+        best = self.population[int(self.errors.argmin())]
+        # Index of the first sample since the population was last seeded.
+        seeded_at = len(self.samples)
+        while best.error >= ERROR_THRESHOLD:
+            start = time.monotonic()
+            if start >= deadline:
+                break
+            # Fill time that is too short for a whole generation with steady-state steps.
+            if start + generation_cost > deadline:
+                best = self.evolve_until(deadline, best)
+                break
+            self.reproduce()
+            self.calculate_error()
+            cost = time.monotonic() - start
+            generation_cost = COST_SMOOTHING * cost + (1 - COST_SMOOTHING) * generation_cost
+            # Track the best individual so far.
+            best_i = int(self.errors.argmin())
+            self.samples.append(self.errors[best_i])
+            if self.population[best_i].error < best.error:
+                best = self.population[best_i]
+            self.maybe_promote(len(self.samples) - 1)
+            # Reseed, keeping the best individual so far, if progress has stalled and there is time to make use of
+            # it (reseeding scores a whole population, which costs less than a generation).
+            if self.stagnated(seeded_at, patience) and time.monotonic() + generation_cost <= deadline:
+                self.reseed([deepcopy(best)])
+                seeded_at = len(self.samples)
+        # Make sure the best individual so far survives in the population.
+        if best not in self.population:
+            worst_i = int(self.errors.argmax())
+            self.population[worst_i] = best
+            self.errors[worst_i] = best.error
+        return best
+
+    def score_until(self, deadline, chunk_size=TIMED_CHUNK_SIZE):
+        """
+        Calculate the error of each chromosome in chunks until a deadline, giving the rest an infinite error.
+
+        The first chunk is always scored.
+
+        Args:
+            deadline (float): The time.monotonic() value to stop at.
+            chunk_size (int): The number of chromosomes scored between deadline checks.
+
+        Returns:
+            int: The number of chromosomes scored.
+
+        """
+        scored = 0
+        while scored < len(self.population) and (scored == 0 or time.monotonic() < deadline):
+            self.score(self.population[scored:scored + chunk_size])
+            scored = min(scored + chunk_size, len(self.population))
+        for chromosome in self.population[scored:]:
+            chromosome.error = float('inf')
+        self.errors = np.array([chromosome.error for chromosome in self.population], dtype=np.float64)
+        return scored
+
+    def evolve_until(self, deadline, best):
+        """
+        Perform steady-state steps until a deadline.
+
+        Args:
+            deadline (float): The time.monotonic() value to stop at.
+            best (Chromosome): The best individual so far.
+
+        Returns:
+            Chromosome: The best individual so far.
+
+        """
+        heap = ErrorHeap(self.errors.tolist())
+        while time.monotonic() < deadline and best.error >= ERROR_THRESHOLD:
+            self.steady_state_step(heap)
+            best_i = heap.best()
+            if self.population[best_i].error < best.error:
+                best = self.population[best_i]
+        self.samples.append(best.error)
+        return best
+
+    def stagnated(self, start, patience):
+        """
+        Check whether the best error sampled since a given generation has stopped improving.
+
+        Args:
+            start (int): The index of the first sample to consider.
+            patience (int): The number of recent samples which must show no improvement.
+
+        Returns:
+            bool: True if the last patience samples did not improve on the earlier best by STAGNATION_TOLERANCE.
+
+        """
+        samples = self.samples[start:]
+        if len(samples) <= patience:
+            return False
+        earlier_best = min(samples[:-patience])
+        return min(samples[-patience:]) >= earlier_best * (1 - STAGNATION_TOLERANCE)
+
+    def reseed(self, survivors):
+        """
+        Replace the population with the given survivors and newly grown chromosomes.
+
+        Args:
+            survivors (list of Chromosome): The chromosomes to keep.
+
+        """
+        self.population = list(survivors)
+        self.generate_population()
+        self.calculate_error()
+
+    def evolve_pipelined(self, generations, chunk_size=PIPELINE_CHUNK_SIZE, ready_fraction=READY_FRACTION,
+                         max_workers=None):
+        """
+        Evolve the nucleus, evaluating offspring in the background while the next ones are bred.
+
+        Offspring are sent for evaluation in chunks as soon as they are bred. Selection only considers individuals
+        whose error is known: the next generation starts once ready_fraction of the offspring chunks are evaluated,
+        and offspring finishing during its breeding join the tournaments as they arrive. Offspring still unevaluated
+        when their generation is replaced are dropped. Evaluation runs in threads when an evaluator is set (its
+        NumPy or network work releases the GIL) and in processes otherwise. Each process receives the dataset once
+        when it starts, and chunks only carry the equations as postfix programs.
+
+        Args:
+            generations (int): The number of generations to evolve.
+            chunk_size (int): The number of offspring per evaluation task.
+            ready_fraction (float): The fraction of evaluation tasks to wait for before starting the next generation.
+            max_workers (int or None): The number of evaluation threads or processes (default chosen by the pool).
+
+        Returns:
+            bool: True if error dropped below threshold, False if not.
+
+        """
+        self.calculate_error()
+        in_processes = self.evaluator is None
+        if in_processes:
+            executor = ProcessPoolExecutor(
+                max_workers,
+                initializer=init_process,
+                initargs=(self.ind_vars, self.dep_vars)
+            )
+            task = partial(score_chunk, prescreen=self.prescreen)
+        else:
+            executor = ThreadPoolExecutor(max_workers)
+            task = self.chunk_errors
+        # Whether the error of each individual in the population is known, and tasks evaluating the rest.
+        scored = np.ones(len(self.population), dtype=bool)
+        pending = {}
+        found = False
+        with executor:
+            for i in range(generations):
+                new_population = []
+                new_scored = []
+                new_pending = {}
+                remaining = self.population_size // 4
+                while remaining > 0:
+                    # Let offspring which have been evaluated in the meantime join the tournaments.
+                    self.collect(pending, scored)
+                    count = min(remaining, max(chunk_size // 2, 1))
+                    remaining -= count
+                    children = []
+                    indices = []
+                    for winner_indices in self.batch_tournament(count, self.tournament_size, np.flatnonzero(scored)):
+                        winners = [self.population[j] for j in winner_indices]
+                        children += self.breed(winners)
+                        # Add parents and children to the new population, remembering where the children are.
+                        new_population += winners
+                        new_scored += [True] * len(winners)
+                        indices += [len(new_population), len(new_population) + 1]
+                        new_population += children[-2:]
+                        new_scored += [False, False]
+                    # Send the offspring for evaluation.
+                    if in_processes:
+                        chunk = [child.equation.to_postfix(symbols=True) for child in children]
+                    else:
+                        chunk = children
+                    new_pending[executor.submit(task, chunk)] = indices
+                # Replace the generation, dropping its offspring that are still being evaluated.
+                for future in pending:
+                    future.cancel()
+                self.population = new_population
+                self.errors = np.array([
+                    chromosome.error if is_scored else np.inf
+                    for chromosome, is_scored in zip(self.population, new_scored)
+                ])
+                scored = np.array(new_scored)
+                pending = new_pending
+                # Wait until enough offspring are evaluated to start the next generation.
+                self.collect(pending, scored, len(pending) * (1 - ready_fraction))
+                best_error = self.errors[scored].min()
+                # Add best error to samples.
+                self.samples.append(best_error)
+                # If best is below threshold, exit.
+                if best_error < ERROR_THRESHOLD:
+                    found = True
+                    break
+            # Finish evaluating the final population.
+            self.collect(pending, scored, 0)
+        return found
+
+    def collect(self, pending, scored, max_pending=None):
+        """
+        Record the errors of finished evaluation tasks, optionally waiting for tasks to finish.
+
+        Args:
+            pending (dict): Mapping of evaluation futures to the population indices of the chromosomes evaluated.
+            scored (numpy.ndarray): Whether the error of each individual is known, updated in place.
+            max_pending (float or None): Wait until at most this many tasks are pending (default don't wait).
+
+        """
+        while True:
+            for future in [future for future in pending if future.done()]:
+                indices = pending.pop(future)
+                for j, error in zip(indices, future.result()):
+                    self.population[j].error = error
+                    self.errors[j] = error
+                    scored[j] = True
+            if max_pending is None or len(pending) <= max_pending:
+                return
+            wait(pending, return_when=FIRST_COMPLETED)
+
+    def maybe_promote(self, generation):
+        """
+        Promote frequent subtrees to terminals if a promotion is due after the given generation.
+
+        Args:
+            generation (int): The index of the generation just completed.
+
+        """
+        if self.promote_interval and (generation + 1) % self.promote_interval == 0:
+            self.promote_subtrees()
+
+    def promote_subtrees(self, count=PROMOTE_COUNT, frequency=PROMOTE_FREQUENCY, min_size=PROMOTE_MIN_SIZE,
+                         max_size=PROMOTE_MAX_SIZE, max_derived=MAX_DERIVED):
+        """
+        Promote the subtrees most common across the population to terminals with precomputed values.
+
+        Each promoted subtree becomes a DerivedVariable, which is added to the independent variables and the terminal
+        set, and every tree is rewritten to use it in place of the subtree. Errors are unchanged by the rewrite.
+        Subtrees without independent variables are constant, so they are never promoted. Derived variables no
+        longer used by any tree are retired first, frequent subtrees which were promoted before reuse their existing
+        variable, and no more than max_derived derived variables are kept.
+
+        Args:
+            count (int): The max number of subtrees to promote.
+            frequency (float): The least fraction of the population a subtree must appear in.
+            min_size (int): The least number of nodes in a promoted subtree.
+            max_size (int): The greatest number of nodes in a promoted subtree.
+            max_derived (int): The max number of derived variables in use at once.
+
+        Returns:
+            list of DerivedVariable: The new terminals.
+
+        """
+        derived = {ind_var.symbol: ind_var for ind_var in self.retire_unused() if isinstance(ind_var, DerivedVariable)}
+        # Count the number of trees each subtree appears in.
+        counts = {}
+        subtrees = {}
+        for chromosome in self.population:
+            keys = set()
+            for node, key in chromosome.equation.subtree_keys():
+                if min_size <= node.descendents_cnt + 1 <= max_size:
+                    keys.add(key)
+                    subtrees.setdefault(key, node)
+            for key in keys:
+                counts[key] = counts.get(key, 0) + 1
+        # Prefer the subtrees which save the most evaluation work.
+        frequent = [
+            key for key in counts
+            if counts[key] >= frequency * len(self.population) and self.has_variable(subtrees[key])
+        ]
+        frequent.sort(key=lambda key: counts[key] * (subtrees[key].descendents_cnt + 1), reverse=True)
+        terminals = {}
+        new = []
+        for key in frequent[:count]:
+            # Subtrees regrown since their promotion are replaced by the existing variable.
+            if key in derived:
+                terminals[key] = derived[key]
+                continue
+            if len(derived) + len(new) >= max_derived:
+                continue
+            vals = self.subtree_values(subtrees[key])
+            if vals is not None:
+                terminals[key] = DerivedVariable(key, vals, deepcopy(subtrees[key]))
+                new.append(terminals[key])
+        if not terminals:
+            return []
+        # Add the new terminals and rewrite the trees to use them (keeping the terminal set a sequence to sample from).
+        self.ind_vars.extend(new)
+        EquationTree.TERMINAL_SET = tuple(EquationTree.TERMINAL_SET) + tuple(new)
+        for chromosome in self.population:
+            chromosome.substitute(terminals)
+        return new
+
+    def retire_unused(self):
+        """
+        Remove derived variables which no tree in the population uses from the independent variables and terminals.
+
+        Returns:
+            list: The remaining independent variables.
+
+        """
+        used = set()
+        for chromosome in self.population:
+            used.update(
+                node.val for node in chromosome.equation.postorder() if isinstance(node.val, DerivedVariable)
+            )
+        unused = [ind_var for ind_var in self.ind_vars if isinstance(ind_var, DerivedVariable) and ind_var not in used]
+        if unused:
+            # Update in place, as chromosomes and evaluators share the list.
+            self.ind_vars[:] = [ind_var for ind_var in self.ind_vars if ind_var not in unused]
+            EquationTree.TERMINAL_SET = tuple(
+                terminal for terminal in EquationTree.TERMINAL_SET if not any(terminal is ind_var for ind_var in unused)
+            )
+            # Drop their shared leaves too, so their values can be freed.
+            for ind_var in unused:
+                EquationTree.LEAVES.pop((type(ind_var), ind_var), None)
+        return self.ind_vars
+
+    @staticmethod
+    def has_variable(subtree):
+        """
+        Check whether a subtree references any independent variable.
+
+        Args:
+            subtree (EquationTree): The subtree to check.
+
+        Returns:
+            bool: True if any leaf is an independent variable.
+
+        """
+        return any(isinstance(node.val, IndependentVariable) for node in subtree.postorder())
+
+    def subtree_values(self, subtree):
+        """
+        Evaluate a subtree for each set of independent values.
+
+        Args:
+            subtree (EquationTree): The subtree to evaluate.
+
+        Returns:
+            list or numpy.ndarray or None: The value for each set (matching the type of the independent values), or
+                None if the subtree divides by zero.
+
+        """
+        order = subtree.postorder()
+        used = {node.val for node in order if isinstance(node.val, IndependentVariable)}
+        vals = []
+        try:
+            with np.errstate(divide='raise', invalid='raise'):
+                for i in range(len(self.dep_vars)):
+                    for ind_var in used:
+                        ind_var.set_current_val(i)
+                    vals.append(subtree.evaluate(order))
+        except (ZeroDivisionError, FloatingPointError):
+            return None
+        # Keep the precision of the independent values.
+        if isinstance(self.ind_vars[0].vals, np.ndarray):
+            return np.array(vals, dtype=self.ind_vars[0].vals.dtype)
+        return vals
+
     def plot_learning(self, resolution=100):
         """
         Plot the learning curve (changing best error of each generation).
 
         """
-        self.sort()
-        # Get the divisor to limit the number of samples.
-        step = len(self.samples) // resolution
-        if step == 0:
-            step = 1
-        # Get samples.
-        x = list(range(0, len(self.samples), step))
-        y = [self.samples[i] for i in x]
-        # Setup plot.
-        plt.grid(True)
-        plt.title('Function Finder Learning Curve: {0}'.format(str(self.population[0])))
-        plt.xlabel('Samples every {0} generations'.format(step))
-        plt.ylabel('Least error')
-        plt.plot(x, y)
-        # Save plot.
-        timestamp = datetime.now().strftime('%m-%d-%Y_%I-%M-%S-%p')
-        name = 'learning_curve_{0}.png'.format(timestamp)
-        save_dir = os.path.join(os.path.abspath(PLOT_DIR), name)
-        plt.savefig(save_dir, dpi=200)
+        PlotSink(resolution).report(self)
 
     def sort(self):
         """
         Sort the population according to error (increasing).
 
         """
-        self.population.sort(key=lambda x: x.error)
+        order = np.argsort(self.errors, kind='stable')
+        self.population = [self.population[i] for i in order]
+        self.errors = self.errors[order]
 
     def calculate_error(self):
         """
         Calculate the error of each chromosome.
 
         """
-        for chromosome in self.population:
-            try:
-                chromosome.error = chromosome.get_error()
-            except ZeroDivisionError:
+        self.score(self.population)
+        self.errors = np.array([chromosome.error for chromosome in self.population], dtype=np.float64)
+
+    def score(self, chromosomes):
+        """
+        Calculate the error of the given chromosomes, using the evaluator if one is set.
+
+        Args:
+            chromosomes (list of Chromosome): The chromosomes to evaluate.
+
+        """
+        if self.prescreen:
+            chromosomes = self.screen(chromosomes)
+        if self.evaluator is None:
+            for chromosome in chromosomes:
+                self.evaluate_chromosome(chromosome)
+            return
+        for chromosome, error in zip(chromosomes, self.evaluator(chromosomes)):
+            chromosome.error = error
+
+    def chunk_errors(self, chromosomes):
+        """
+        Calculate the error of the given chromosomes (for evaluation in threads).
+
+        Args:
+            chromosomes (list of Chromosome): The chromosomes to evaluate.
+
+        Returns:
+            list of float: The error of each chromosome.
+
+        """
+        self.score(chromosomes)
+        return [chromosome.error for chromosome in chromosomes]
+
+    @staticmethod
+    def screen(chromosomes):
+        """
+        Give chromosomes that are not bounded over the input domain an infinite error.
+
+        Args:
+            chromosomes (list of Chromosome): The chromosomes to screen.
+
+        Returns:
+            list of Chromosome: The chromosomes which are bounded and still need evaluating.
+
+        """
+        defined = []
+        for chromosome in chromosomes:
+            if chromosome.equation.is_bounded():
+                defined.append(chromosome)
+            else:
                 chromosome.error = float('inf')
+        return defined
+
+    @staticmethod
+    def evaluate_chromosome(chromosome):
+        """
+        Calculate the error of a single chromosome.
+
+        Args:
+            chromosome (Chromosome): The chromosome to evaluate.
+
+        """
+        try:
+            # NumPy values (when a precision is configured) signal division by zero with FloatingPointError.
+            with np.errstate(divide='raise', invalid='raise'):
+                chromosome.error = chromosome.get_error()
+        except (ZeroDivisionError, FloatingPointError):
+            chromosome.error = float('inf')
 
     def tournament(self, k):
         """
@@ -135,24 +688,52 @@ class Nucleus:
             k (int): The number of individuals to participate in the tournament (must be divisible by 2).
 
         Raises:
-            ValueError: If selection size not divisible by 2.
+            ValueError: If selection size not divisible by 2 or larger than the population.
 
         Returns:
             list[Chromosome]: The n/2 winners of the tournament.
 
+        """
+        return [self.population[i] for i in self.batch_tournament(1, k)[0]]
+
+    def batch_tournament(self, count, k, candidates=None):
+        """
+        Perform many tournaments at once over the error array.
+
+        Each tournament samples k distinct individuals, which compete in pairs.
+
+        Args:
+            count (int): The number of tournaments to perform.
+            k (int): The number of individuals to participate in each tournament (must be divisible by 2).
+            candidates (numpy.ndarray): Population indices of the individuals that may participate (default all).
+
+        Raises:
+            ValueError: If selection size not divisible by 2 or larger than the population.
+
+        Returns:
+            numpy.ndarray: The population indices of the k/2 winners of each tournament, of shape (count, k/2).
+
         """
         if k % 2 != 0:
             raise ValueError('Selection size not divisible by 2.')
-        # Get participants.
-        participants = random.sample(self.population, k)
-        # Get the winners.
-        winners = []
-        for i in range(k // 2):
-            if participants[i * 2].error < participants[i * 2 + 1].error:
-                winners.append(participants[i * 2])
-            else:
-                winners.append(participants[i * 2 + 1])
-        return winners
+        if candidates is None:
+            candidates = np.arange(len(self.population))
+        if k > len(candidates):
+            raise ValueError('Selection size larger than population.')
+        # Get participants, redrawing the (rare) tournaments that picked an individual twice.
+        participants = candidates[self.rng.integers(0, len(candidates), size=(count, k))]
+        redraw = np.ones(count, dtype=bool)
+        while True:
+            ordered = np.sort(participants[redraw], axis=1)
+            duplicates = (ordered[:, 1:] == ordered[:, :-1]).any(axis=1)
+            redraw[redraw] = duplicates
+            if not redraw.any():
+                break
+            participants[redraw] = candidates[self.rng.integers(0, len(candidates), size=(redraw.sum(), k))]
+        # Get the winner of each pair.
+        pairs = participants.reshape(count, k // 2, 2)
+        first_wins = self.errors[pairs[:, :, 0]] < self.errors[pairs[:, :, 1]]
+        return np.where(first_wins, pairs[:, :, 0], pairs[:, :, 1])
 
     @staticmethod
     def get_winner(chromosome_1, chromosome_2):
@@ -171,6 +752,28 @@ class Nucleus:
             return chromosome_1
         return chromosome_2
 
+    @staticmethod
+    def breed(winners):
+        """
+        Create two children from the first two tournament winners.
+
+        Args:
+            winners (list of Chromosome): The winners of a tournament.
+
+        Returns:
+            tuple: The two children.
+
+        """
+        # Deepcopy the winners, creating 2 children-to-be.
+        child_1 = deepcopy(winners[0])
+        child_2 = deepcopy(winners[1])
+        # Mutate them.
+        child_1.mutate()
+        child_2.mutate()
+        # Crossover, making them children.
+        child_1.crossover(child_2)
+        return child_1, child_2
+
     def alt_reproduce(self):
         """
         Alternate reproduction process.
@@ -193,8 +796,9 @@ class Nucleus:
             child_2.mutate()
             # Add parents and children to the new population.
             new_population += [par_1, par_2, child_1, child_2]
-        # Update the population.
+        # Update the population, and the errors which are looked up by position.
         self.population = new_population
+        self.calculate_error()
 
     def reproduce(self):
         """
@@ -204,17 +808,11 @@ class Nucleus:
         # Update error calculation before reproducing.
         self.calculate_error()
         new_population = []
-        for i in range(self.population_size // 4):
-            # Perform the tournament selection process.
-            winners = self.tournament(self.tournament_size)
-            # Deepcopy the winners, creating 2 children-to-be.
-            child_1 = deepcopy(winners[0])
-            child_2 = deepcopy(winners[1])
-            # Mutate them.
-            child_1.mutate()
-            child_2.mutate()
-            # Crossover, making them children.
-            child_1.crossover(child_2)
+        # Perform the tournament selection process for the whole generation at once.
+        all_winners = self.batch_tournament(self.population_size // 4, self.tournament_size)
+        for winner_indices in all_winners:
+            winners = [self.population[i] for i in winner_indices]
+            child_1, child_2 = self.breed(winners)
             # Add parents and children to the new population.
             new_population += winners + [child_1, child_2]
         # Update the population.
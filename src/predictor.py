@@ -0,0 +1,201 @@
+"""
+Standalone vectorized predictor for serving evolved equations.
+
+"""
+import json
+
+import numpy as np
+
+from src.math_functions import DerivedVariable, IndependentVariable
+
+# Mapping of operator names to their vectorized implementations.
+OPERATORS = {
+    'Add': np.add,
+    'Subtract': np.subtract,
+    'Multiply': np.multiply,
+    'Divide': np.divide
+}
+# Default number of rows per chunk when streaming.
+CHUNK_SIZE = 65536
+
+
+def compile_tree(tree, variables):
+    """
+    Compile an equation tree into a postfix program.
+
+    Derived variables not listed in variables are compiled as the subexpression they stand for.
+
+    Args:
+        tree (EquationTree): The root of the equation tree.
+        variables (list of str): The independent variable symbols, in input column order.
+
+    Returns:
+        list of list: The postfix program. Each instruction is ['const', value], ['var', column] or ['op', name].
+
+    """
+    program = []
+    stack = [(tree, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if isinstance(node.val, DerivedVariable) and node.val.symbol not in variables:
+            stack.append((node.val.expression, False))
+        elif isinstance(node.val, IndependentVariable):
+            program.append(['var', variables.index(node.val.symbol)])
+        elif node.is_terminal:
+            program.append(['const', node.val])
+        elif expanded:
+            program.append(['op', node.op.__name__])
+        else:
+            # Revisit this node after its children, which are pushed so the first child is compiled first.
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(node.children))
+    return program
+
+
+def run_program(program, columns, rows, strict=False, dtype=np.float64):
+    """
+    Run a postfix program over columns of input values.
+
+    Args:
+        program (list of list): The postfix program.
+        columns (list of numpy.ndarray): The value column of each independent variable.
+        rows (int): The number of rows in each column.
+        strict (bool): Whether to raise on division by zero (like scalar evaluation) instead of producing inf/nan.
+        dtype (numpy.dtype): The precision of intermediates and the result.
+
+    Raises:
+        ZeroDivisionError: If strict and a divisor is zero in any row.
+
+    Returns:
+        numpy.ndarray: The result for each row.
+
+    """
+    stack = []
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        for kind, arg in program:
+            if kind == 'const':
+                stack.append(dtype(arg))
+            elif kind == 'var':
+                stack.append(columns[arg])
+            else:
+                right = stack.pop()
+                left = stack.pop()
+                if strict and arg == 'Divide' and np.any(np.equal(right, 0)):
+                    raise ZeroDivisionError('Division by zero.')
+                stack.append(OPERATORS[arg](left, right, dtype=dtype))
+    # A program without variables evaluates to a scalar, so broadcast it to every row.
+    return np.broadcast_to(np.asarray(stack[0], dtype=dtype), (rows,)).copy()
+
+
+class Predictor:
+    """
+    A compiled equation that predicts dependent values for arrays of independent values.
+
+    Attributes:
+        variables (list of str): The independent variable symbols, in input column order.
+        program (list of list): The postfix program of the equation.
+
+    """
+
+    def __init__(self, variables, program):
+        self.variables = list(variables)
+        self.program = program
+
+    @classmethod
+    def from_chromosome(cls, chromosome):
+        """
+        Compile a chromosome's equation into a predictor.
+
+        Args:
+            chromosome (Chromosome): The chromosome to compile.
+
+        Returns:
+            Predictor: The compiled predictor.
+
+        """
+        variables = [ind_var.symbol for ind_var in chromosome.ind_vars if not isinstance(ind_var, DerivedVariable)]
+        return cls(variables, compile_tree(chromosome.equation, variables))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a predictor from a file.
+
+        Args:
+            path (str): The file to load from.
+
+        Returns:
+            Predictor: The loaded predictor.
+
+        """
+        with open(path) as data:
+            raw = json.load(data)
+        return cls(raw['variables'], raw['program'])
+
+    def save(self, path):
+        """
+        Save the predictor to a compact JSON file.
+
+        Args:
+            path (str): The file to save to.
+
+        """
+        with open(path, 'w') as data:
+            json.dump({'variables': self.variables, 'program': self.program}, data, separators=(',', ':'))
+
+    def predict(self, values):
+        """
+        Predict the dependent value of each row.
+
+        Args:
+            values (array-like): Independent values of shape (rows, variables), or (rows,) if there is one variable.
+
+        Returns:
+            numpy.ndarray: The prediction for each row.
+
+        Raises:
+            ValueError: If the number of columns does not match the number of variables.
+
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if values.ndim == 1 and len(self.variables) == 1:
+            values = values.reshape(-1, 1)
+        if values.ndim != 2 or values.shape[1] != len(self.variables):
+            raise ValueError('Expected {0} columns of independent values.'.format(len(self.variables)))
+        columns = [values[:, i] for i in range(values.shape[1])]
+        return run_program(self.program, columns, values.shape[0])
+
+    def predict_chunks(self, chunks):
+        """
+        Lazily predict over a stream of chunks.
+
+        Args:
+            chunks (iterable of array-like): Chunks of independent values, each accepted by predict.
+
+        Yields:
+            numpy.ndarray: The predictions for each chunk.
+
+        """
+        for chunk in chunks:
+            yield self.predict(chunk)
+
+    def predict_rows(self, rows, chunk_size=CHUNK_SIZE):
+        """
+        Lazily predict over a stream of individual rows, batching them into chunks.
+
+        Args:
+            rows (iterable): Rows of independent values.
+            chunk_size (int): The number of rows to predict at a time.
+
+        Yields:
+            numpy.ndarray: The predictions for each chunk of rows.
+
+        """
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                yield self.predict(chunk)
+                chunk = []
+        if chunk:
+            yield self.predict(chunk)
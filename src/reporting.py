@@ -0,0 +1,128 @@
+"""
+Reporting sinks for the results of an evolution.
+
+Sinks only import what they need when they report, so plotting libraries are never loaded by headless runs or worker
+processes.
+
+"""
+import os.path
+from datetime import datetime
+
+# Directory to save plots and sample files.
+PLOT_DIR = 'plots'
+
+
+def timestamp():
+    """
+    Get a timestamp for naming report files.
+
+    Returns:
+        str: The current time.
+
+    """
+    return datetime.now().strftime('%m-%d-%Y_%I-%M-%S-%p')
+
+
+class PlotSink:
+    """
+    Saves a plot of the learning curve (changing best error of each generation).
+
+    Attributes:
+        resolution (int): The max number of samples to plot.
+        plot_dir (str): The directory to save the plot in.
+
+    """
+
+    def __init__(self, resolution=100, plot_dir=PLOT_DIR):
+        self.resolution = resolution
+        self.plot_dir = plot_dir
+
+    def report(self, nucleus):
+        """
+        Plot the learning curve of a nucleus.
+
+        Args:
+            nucleus (Nucleus): The evolved nucleus.
+
+        """
+        # Only load matplotlib (and its backend) when a plot is actually made.
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+        nucleus.sort()
+        # Get the divisor to limit the number of samples.
+        step = len(nucleus.samples) // self.resolution
+        if step == 0:
+            step = 1
+        # Get samples.
+        x = list(range(0, len(nucleus.samples), step))
+        y = [nucleus.samples[i] for i in x]
+        # Setup plot.
+        plt.grid(True)
+        plt.title('Function Finder Learning Curve: {0}'.format(str(nucleus.population[0])))
+        plt.xlabel('Samples every {0} generations'.format(step))
+        plt.ylabel('Least error')
+        plt.plot(x, y)
+        # Save plot.
+        name = 'learning_curve_{0}.png'.format(timestamp())
+        save_dir = os.path.join(os.path.abspath(self.plot_dir), name)
+        plt.savefig(save_dir, dpi=200)
+
+
+class CsvSink:
+    """
+    Saves the best error of each generation to a CSV file.
+
+    Attributes:
+        plot_dir (str): The directory to save the file in.
+
+    """
+
+    def __init__(self, plot_dir=PLOT_DIR):
+        self.plot_dir = plot_dir
+
+    def report(self, nucleus):
+        """
+        Write the samples of a nucleus.
+
+        Args:
+            nucleus (Nucleus): The evolved nucleus.
+
+        """
+        name = 'learning_curve_{0}.csv'.format(timestamp())
+        with open(os.path.join(os.path.abspath(self.plot_dir), name), 'w') as data:
+            data.write('generation,least_error\n')
+            for i, sample in enumerate(nucleus.samples):
+                data.write('{0},{1}\n'.format(i, sample))
+
+
+class PrintSink:
+    """
+    Prints a summary of the learning curve.
+
+    """
+
+    @staticmethod
+    def report(nucleus):
+        """
+        Print the number of generations and the first and last best errors of a nucleus.
+
+        Args:
+            nucleus (Nucleus): The evolved nucleus.
+
+        """
+        if not nucleus.samples:
+            return
+        print('Generations: {0}, least error from {1} to {2}'.format(
+            len(nucleus.samples),
+            nucleus.samples[0],
+            nucleus.samples[-1]
+        ))
+
+
+# Mapping of report names to their sinks.
+SINKS = {
+    'plot': PlotSink,
+    'csv': CsvSink,
+    'print': PrintSink
+}
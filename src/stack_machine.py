@@ -0,0 +1,166 @@
+"""
+Whole-population evaluation of equations as a vectorized stack machine.
+
+Every equation in a batch is compiled into a postfix program and the programs are padded into one opcode table. At
+each step the stack machine runs every distinct opcode once, as a NumPy operation over all individuals currently
+executing it, on a value stack of shape (stack depth, individuals, rows).
+
+"""
+import numpy as np
+
+from src.predictor import compile_tree
+
+# Opcodes.
+NOP = 0
+CONST = 1
+VAR = 2
+ADD = 3
+SUBTRACT = 4
+MULTIPLY = 5
+DIVIDE = 6
+# Mapping of operator names to opcodes and of binary opcodes to their vectorized implementations.
+OPCODES = {
+    'Add': ADD,
+    'Subtract': SUBTRACT,
+    'Multiply': MULTIPLY,
+    'Divide': DIVIDE
+}
+BINARY_OPERATORS = {
+    ADD: np.add,
+    SUBTRACT: np.subtract,
+    MULTIPLY: np.multiply,
+    DIVIDE: np.divide
+}
+# Max number of values in the stack of a single pass; larger batches are split over several passes.
+MAX_STACK_CELLS = 2 ** 25
+
+
+class StackMachineEvaluator:
+    """
+    Evaluates whole populations of chromosomes at once.
+
+    Instances are used as a Nucleus evaluator.
+
+    Attributes:
+        ind_vars (list of IndependentVariable): The independent variables.
+        dep_vars (numpy.ndarray): The dependent values.
+        dtype (numpy.dtype): The precision of values and intermediates (errors are accumulated in float64).
+        max_stack_cells (int): Max number of values in the stack of a single pass.
+
+    """
+
+    def __init__(self, ind_vars, dep_vars, dtype=np.float64, max_stack_cells=MAX_STACK_CELLS):
+        self.ind_vars = ind_vars
+        self.dtype = np.dtype(dtype)
+        self.dep_vars = np.asarray(dep_vars, dtype=self.dtype)
+        self.max_stack_cells = max_stack_cells
+
+    def __call__(self, chromosomes):
+        """
+        Calculate the error of each chromosome.
+
+        Args:
+            chromosomes (list of Chromosome): The chromosomes to evaluate.
+
+        Returns:
+            list of float: The error of each chromosome (inf if it divides by zero or is not finite).
+
+        """
+        variables = [ind_var.symbol for ind_var in self.ind_vars]
+        columns = np.array([ind_var.vals for ind_var in self.ind_vars], dtype=self.dtype)
+        programs = [compile_tree(chromosome.equation, variables) for chromosome in chromosomes]
+        depths = [self.stack_depth(program) for program in programs]
+        errors = []
+        # Split into passes so the value stack stays within bounds.
+        start = 0
+        while start < len(programs):
+            end = start + 1
+            depth = depths[start]
+            while end < len(programs):
+                new_depth = max(depth, depths[end])
+                if new_depth * (end + 1 - start) * len(self.dep_vars) > self.max_stack_cells:
+                    break
+                depth = new_depth
+                end += 1
+            errors += self.run(programs[start:end], depth, columns).tolist()
+            start = end
+        return errors
+
+    @staticmethod
+    def stack_depth(program):
+        """
+        Get the max stack depth reached by a postfix program.
+
+        Args:
+            program (list of list): The postfix program.
+
+        Returns:
+            int: The max stack depth.
+
+        """
+        depth = 0
+        max_depth = 0
+        for kind, arg in program:
+            if kind == 'op':
+                depth -= 1
+            else:
+                depth += 1
+                max_depth = max(max_depth, depth)
+        return max_depth
+
+    def run(self, programs, depth, columns):
+        """
+        Run a batch of programs together.
+
+        Args:
+            programs (list of list): The postfix programs.
+            depth (int): The max stack depth of the programs.
+            columns (numpy.ndarray): The value columns of the independent variables, of shape (variables, rows).
+
+        Returns:
+            numpy.ndarray: The error of each program.
+
+        """
+        count = len(programs)
+        length = max(len(program) for program in programs)
+        # Pad the programs into a (step, individual) table of opcodes and arguments.
+        codes = np.full((length, count), NOP, dtype=np.int8)
+        args = np.zeros((length, count), dtype=self.dtype)
+        for i, program in enumerate(programs):
+            for step, (kind, arg) in enumerate(program):
+                if kind == 'const':
+                    codes[step, i] = CONST
+                    args[step, i] = arg
+                elif kind == 'var':
+                    codes[step, i] = VAR
+                    args[step, i] = arg
+                else:
+                    codes[step, i] = OPCODES[arg]
+        stack = np.empty((depth, count, len(self.dep_vars)), dtype=self.dtype)
+        pointers = np.zeros(count, dtype=np.intp)
+        divided_by_zero = np.zeros(count, dtype=bool)
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            for step in range(length):
+                step_codes = codes[step]
+                for code in np.unique(step_codes):
+                    if code == NOP:
+                        continue
+                    individuals = np.flatnonzero(step_codes == code)
+                    top = pointers[individuals]
+                    if code == CONST:
+                        stack[top, individuals] = args[step, individuals][:, np.newaxis]
+                        pointers[individuals] += 1
+                    elif code == VAR:
+                        stack[top, individuals] = columns[args[step, individuals].astype(np.intp)]
+                        pointers[individuals] += 1
+                    else:
+                        right = stack[top - 1, individuals]
+                        if code == DIVIDE:
+                            divided_by_zero[individuals] |= (right == 0).any(axis=1)
+                        stack[top - 2, individuals] = BINARY_OPERATORS[code](stack[top - 2, individuals], right)
+                        pointers[individuals] -= 1
+            residuals = (stack[0] - self.dep_vars).astype(np.float64)
+            errors = np.einsum('ij,ij->i', residuals, residuals)
+        # Match scalar evaluation, where division by zero gives an infinite error.
+        errors[divided_by_zero | ~np.isfinite(errors)] = np.inf
+        return errors
@@ -0,0 +1,215 @@
+"""
+Tests for distributed evaluation against in-process workers on localhost.
+
+Run with:   python3 -m pytest tests   (or python3 -m unittest discover tests)
+
+"""
+import socket
+import threading
+import time
+import unittest
+
+import numpy as np
+
+from src.chromosome import Chromosome
+from src.distributed import DistributedEvaluator, Worker, WorkerHandler, receive_message, send_message
+from src.equation_tree import EquationTree
+from src.math_functions import Add, Divide, IndependentVariable, Multiply, Subtract
+from src.nucleus import Nucleus
+
+# Localhost address workers listen on.
+HOST = '127.0.0.1'
+# Number of chromosomes sent to a worker at a time (small, so every worker gets several batches).
+BATCH_SIZE = 4
+
+
+class DroppingHandler(WorkerHandler):
+    """
+    Drops the connection on the first evaluation request, as a worker dying mid-batch would.
+
+    """
+
+    def handle(self):
+        while True:
+            try:
+                message = receive_message(self.request)
+            except (ConnectionError, OSError):
+                return
+            if message['type'] == 'evaluate':
+                return
+            send_message(self.request, self.respond(message, self.server.columns, self.server.dep_vals))
+
+
+def internal(op, *children):
+    """
+    Build an internal node over children.
+
+    Args:
+        op: The operator.
+        *children (EquationTree): The children of the node.
+
+    Returns:
+        EquationTree: The node.
+
+    """
+    node = EquationTree()
+    node.init_internal(op)
+    node.children = list(children)
+    node.descendents_cnt = sum(child.descendents_cnt + 1 for child in children)
+    return node
+
+
+def unused_address():
+    """
+    Get a localhost address nothing is listening on.
+
+    Returns:
+        tuple: The (host, port) pair.
+
+    """
+    sock = socket.socket()
+    sock.bind((HOST, 0))
+    address = sock.getsockname()
+    sock.close()
+    return address
+
+
+class DistributedEvaluatorTest(unittest.TestCase):
+
+    def setUp(self):
+        xs = [float(i) for i in range(-10, 11)]
+        self.x = IndependentVariable('x', xs)
+        self.dep_vals = [x ** 2 + 1 for x in xs]
+        self.columns = {'x': np.array(xs)}
+        self.workers = []
+        self.evaluators = []
+
+    def tearDown(self):
+        for evaluator in self.evaluators:
+            evaluator.close()
+        for worker in self.workers:
+            worker.shutdown()
+            worker.server_close()
+
+    def start_worker(self, columns=None, handler=None):
+        """
+        Start a worker on an ephemeral localhost port.
+
+        Args:
+            columns (dict): The worker's value columns (the test dataset by default).
+            handler (type): The worker's request handler (WorkerHandler by default).
+
+        Returns:
+            tuple: The (host, port) the worker listens on.
+
+        """
+        worker = Worker((HOST, 0), self.columns if columns is None else columns, np.array(self.dep_vals))
+        if handler is not None:
+            worker.RequestHandlerClass = handler
+        threading.Thread(target=worker.serve_forever, daemon=True).start()
+        self.workers.append(worker)
+        return worker.server_address
+
+    def evaluator(self, addresses):
+        """
+        Create an evaluator which is closed after the test.
+
+        Args:
+            addresses (list of tuple): The worker addresses.
+
+        Returns:
+            DistributedEvaluator: The evaluator.
+
+        """
+        # Keep the heartbeat out of the way so the tests are deterministic.
+        evaluator = DistributedEvaluator(addresses, batch_size=BATCH_SIZE, heartbeat_interval=60)
+        self.evaluators.append(evaluator)
+        return evaluator
+
+    def chromosomes(self, count):
+        """
+        Build chromosomes with varied equations, including one dividing by zero.
+
+        Args:
+            count (int): The number of chromosomes.
+
+        Returns:
+            list of Chromosome: The chromosomes.
+
+        """
+        x = EquationTree.leaf(self.x)
+        chromosomes = []
+        for i in range(count):
+            c = EquationTree.leaf(i % 7 - 3)
+            equations = [
+                internal(Add, internal(Multiply, x, x), c),
+                internal(Subtract, internal(Multiply, c, x), x),
+                internal(Divide, x, c),
+                internal(Add, x, c)
+            ]
+            chromosome = Chromosome([self.x], self.dep_vals)
+            chromosome.equation = equations[i % len(equations)]
+            chromosomes.append(chromosome)
+        return chromosomes
+
+    def expected(self, chromosomes):
+        """
+        Score chromosomes locally.
+
+        Args:
+            chromosomes (list of Chromosome): The chromosomes.
+
+        Returns:
+            list of float: The error of each chromosome.
+
+        """
+        for chromosome in chromosomes:
+            Nucleus.evaluate_chromosome(chromosome)
+        return [chromosome.error for chromosome in chromosomes]
+
+    def test_matches_local_evaluation(self):
+        chromosomes = self.chromosomes(50)
+        evaluator = self.evaluator([self.start_worker(), self.start_worker()])
+        self.assertEqual(evaluator(chromosomes), self.expected(chromosomes))
+
+    def test_redispatches_batches_of_dead_workers(self):
+        unreachable = unused_address()
+        addresses = [self.start_worker(), self.start_worker(), self.start_worker(handler=DroppingHandler), unreachable]
+        evaluator = self.evaluator(addresses)
+        chromosomes = self.chromosomes(50)
+        start = time.time()
+        errors = evaluator(chromosomes)
+        self.assertEqual(errors, self.expected(chromosomes))
+        self.assertLess(time.time() - start, 1)
+        self.assertEqual([connection.is_open for connection in evaluator.connections], [True, True, False, False])
+        # Later evaluations skip the dead workers.
+        self.assertEqual(evaluator(chromosomes), errors)
+
+    def test_raises_worker_errors(self):
+        evaluator = self.evaluator([self.start_worker(columns={'y': self.columns['x']})])
+        with self.assertRaises(RuntimeError):
+            evaluator(self.chromosomes(10))
+
+    def test_raises_when_every_worker_dies(self):
+        addresses = [self.start_worker(handler=DroppingHandler) for _ in range(2)]
+        with self.assertRaises(ConnectionError):
+            self.evaluator(addresses)(self.chromosomes(10))
+
+    def test_heartbeat_reconnects_workers(self):
+        address = unused_address()
+        evaluator = DistributedEvaluator([address], batch_size=BATCH_SIZE, heartbeat_interval=0.05)
+        self.evaluators.append(evaluator)
+        with self.assertRaises(ConnectionError):
+            evaluator(self.chromosomes(10))
+        worker = Worker(address, self.columns, np.array(self.dep_vals))
+        threading.Thread(target=worker.serve_forever, daemon=True).start()
+        self.workers.append(worker)
+        deadline = time.time() + 5
+        while not evaluator.connections[0].is_open and time.time() < deadline:
+            time.sleep(0.01)
+        chromosomes = self.chromosomes(10)
+        self.assertEqual(evaluator(chromosomes), self.expected(chromosomes))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+"""
+Tests for flattening, pickling and interval arithmetic of equation trees.
+
+"""
+import pickle
+import unittest
+
+from src.equation_tree import EquationTree
+from src.math_functions import Add, DerivedVariable, Divide, IndependentVariable, Multiply, Subtract
+
+
+class PostfixTest(unittest.TestCase):
+
+    def setUp(self):
+        self.x = IndependentVariable('x', [1.0, 2.0, 3.0])
+
+    def chain(self, depth):
+        """
+        Build a tree of nested additions, ((x + 1) + 1) + ...
+
+        Args:
+            depth (int): The number of additions.
+
+        Returns:
+            EquationTree: The root of the tree.
+
+        """
+        tree = EquationTree.leaf(self.x)
+        for _ in range(depth):
+            node = EquationTree()
+            node.init_internal(Add)
+            node.children = [tree, EquationTree.leaf(1)]
+            node.descendents_cnt = tree.descendents_cnt + 2
+            tree = node
+        return tree
+
+    def test_round_trip_by_symbol(self):
+        tree = self.chain(3)
+        tree.children[1] = EquationTree()
+        tree.children[1].init_internal(Multiply)
+        tree.children[1].children = [EquationTree.leaf(self.x), EquationTree.leaf(2)]
+        tree.children[1].descendents_cnt = 2
+        tree.descendents_cnt += 2
+        rebuilt = EquationTree.from_postfix(tree.to_postfix(symbols=True), {'x': self.x})
+        self.assertEqual(rebuilt.render(), tree.render())
+        self.assertEqual(rebuilt.descendents_cnt, tree.descendents_cnt)
+        self.assertIs(rebuilt.children[1].children[0], EquationTree.leaf(self.x))
+
+    def test_pickles_deep_trees(self):
+        tree = self.chain(5000)
+        rebuilt = pickle.loads(pickle.dumps(tree))
+        self.assertEqual(rebuilt.descendents_cnt, tree.descendents_cnt)
+        self.assertEqual(len(rebuilt.postorder()), len(tree.postorder()))
+
+    def test_pickled_leaves_stay_shared(self):
+        self.assertIs(pickle.loads(pickle.dumps(EquationTree.leaf(3))), EquationTree.leaf(3))
+
+
+def internal(op, *children):
+    """
+    Build an internal node over children.
+
+    Args:
+        op: The operator.
+        *children (EquationTree): The children of the node.
+
+    Returns:
+        EquationTree: The node.
+
+    """
+    node = EquationTree()
+    node.init_internal(op)
+    node.children = list(children)
+    node.descendents_cnt = sum(child.descendents_cnt + 1 for child in children)
+    return node
+
+
+class IntervalTest(unittest.TestCase):
+
+    def test_divisor_spanning_zero(self):
+        with self.assertRaises(ZeroDivisionError):
+            Divide.eval_interval([(1, 2), (-1, 1)])
+        # An interval ending at zero also contains it.
+        with self.assertRaises(ZeroDivisionError):
+            Divide.eval_interval([(1, 2), (0, 2)])
+        x = IndependentVariable('x', [-1.0, 0.5, 1.0])
+        self.assertFalse(internal(Divide, EquationTree.leaf(1), EquationTree.leaf(x)).is_bounded())
+
+    def test_constant_zero_divisor(self):
+        with self.assertRaises(ZeroDivisionError):
+            Divide.eval_interval([(1, 1), (0, 0)])
+        x = IndependentVariable('x', [1.0, 2.0])
+        self.assertFalse(internal(Divide, EquationTree.leaf(x), EquationTree.leaf(0)).is_bounded())
+
+    def test_divisor_excluding_zero(self):
+        self.assertEqual(Divide.eval_interval([(1, 2), (2, 4)]), (0.25, 1.0))
+        self.assertEqual(Divide.eval_interval([(1, 2), (-4, -2)]), (-1.0, -0.25))
+        x = IndependentVariable('x', [1.0, 2.0, 4.0])
+        tree = internal(Divide, EquationTree.leaf(1), internal(Add, EquationTree.leaf(x), EquationTree.leaf(1)))
+        self.assertEqual(tree.interval(), (0.2, 0.5))
+        self.assertTrue(tree.is_bounded())
+
+    def test_derived_variable_bounds(self):
+        x = IndependentVariable('x', [-2.0, 0.0, 1.0])
+        square = internal(Multiply, EquationTree.leaf(x), EquationTree.leaf(x))
+        # The bounds of a derived variable come from its values, which are tighter than the interval of its
+        # expression (x * x is within [-2, 4] by interval arithmetic).
+        derived = DerivedVariable('(x * x)', [4.0, 0.0, 1.0], square)
+        self.assertEqual(derived.bounds, (0.0, 4.0))
+        self.assertEqual(square.interval(), (-2.0, 4.0))
+        plus_one = internal(Add, EquationTree.leaf(derived), EquationTree.leaf(1))
+        self.assertEqual(plus_one.interval(), (1.0, 5.0))
+        self.assertTrue(internal(Divide, EquationTree.leaf(1), plus_one).is_bounded())
+        self.assertFalse(internal(Divide, EquationTree.leaf(1), EquationTree.leaf(derived)).is_bounded())
+
+    def test_correlated_subexpressions_are_rejected(self):
+        x = IndependentVariable('x', [1.0, 2.0, 3.0])
+        leaf = EquationTree.leaf(x)
+        # 1 / ((x - x) + 1) is always 1, but x - x is within [-2, 2] by interval arithmetic.
+        divisor = internal(Add, internal(Subtract, leaf, leaf), EquationTree.leaf(1))
+        tree = internal(Divide, EquationTree.leaf(1), divisor)
+        for i in range(len(x.vals)):
+            x.set_current_val(i)
+            self.assertEqual(tree.evaluate(), 1)
+        self.assertFalse(tree.is_bounded())
+
+
+if __name__ == '__main__':
+    unittest.main()
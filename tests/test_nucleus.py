@@ -0,0 +1,126 @@
+"""
+Tests for evolving a nucleus.
+
+"""
+import random
+import unittest
+
+import numpy as np
+
+from src.chromosome import Chromosome
+from src.equation_tree import EquationTree
+from src.math_functions import Add, Divide, DerivedVariable, IndependentVariable, Multiply, Subtract
+from src.nucleus import Nucleus
+
+# Class attributes of EquationTree configured by the tests.
+TREE_CONFIG = ('FUNCTION_SET', 'FUNCTION_PROB', 'TERMINAL_SET', 'TERMINAL_PROB', 'MAX_DEPTH')
+
+
+class RecordingNucleus(Nucleus):
+    """
+    Records the terminals added by each promotion.
+
+    """
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.promoted = []
+
+    def promote_subtrees(self, *args, **kwargs):
+        new = super().promote_subtrees(*args, **kwargs)
+        self.promoted.append(new)
+        return new
+
+
+class NucleusTest(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(0)
+        self.saved = {name: getattr(EquationTree, name) for name in TREE_CONFIG}
+        xs = [i / 10 for i in range(20)]
+        self.x = IndependentVariable('x', xs)
+        self.dep_vals = [x ** 3 / 2 + x for x in xs]
+        # Sequences, as on Python 3.11 random.sample only accepts sequences.
+        EquationTree.FUNCTION_SET = (Add, Subtract, Multiply, Divide)
+        EquationTree.FUNCTION_PROB = 4
+        EquationTree.TERMINAL_SET = tuple(range(-5, 6)) + (self.x,)
+        EquationTree.TERMINAL_PROB = 12
+        EquationTree.MAX_DEPTH = 10
+
+    def tearDown(self):
+        for name, value in self.saved.items():
+            setattr(EquationTree, name, value)
+
+    def nucleus(self, cls=Nucleus, size=40):
+        """
+        Create a nucleus with a grown population.
+
+        Args:
+            cls (type): The nucleus class.
+            size (int): The population size.
+
+        Returns:
+            Nucleus: The nucleus.
+
+        """
+        nucleus = cls(size, [self.x], self.dep_vals, 4)
+        nucleus.generate_population()
+        return nucleus
+
+    def assert_errors_current(self, nucleus):
+        """
+        Check that the errors of a nucleus belong to the chromosomes at the same positions.
+
+        Args:
+            nucleus (Nucleus): The nucleus.
+
+        """
+        expected = []
+        for chromosome in nucleus.population:
+            copy = Chromosome(chromosome.ind_vars, chromosome.dep_vars)
+            copy.equation = chromosome.equation
+            Nucleus.evaluate_chromosome(copy)
+            expected.append(copy.error)
+        np.testing.assert_allclose(nucleus.errors, expected)
+
+    def test_evolve_through_promotions(self):
+        nucleus = self.nucleus(RecordingNucleus)
+        # Share a subtree across the population, so it is frequent enough to promote.
+        shared = EquationTree()
+        shared.init_internal(Add)
+        shared.children = [EquationTree.leaf(self.x), EquationTree.leaf(-5)]
+        shared.descendents_cnt = 2
+        for chromosome in nucleus.population:
+            root = EquationTree()
+            root.init_internal(Multiply)
+            root.children = [shared.__deepcopy__(), chromosome.equation]
+            root.descendents_cnt = 4 + chromosome.equation.descendents_cnt
+            chromosome.equation = root
+        nucleus.promote_interval = 2
+        nucleus.evolve(12)
+        self.assertEqual(len(nucleus.promoted), 6)
+        self.assertIn('(x + -5)', [terminal.symbol for terminal in nucleus.promoted[0]])
+        self.assertIsInstance(EquationTree.TERMINAL_SET, tuple)
+        # Every derived variable still in use is a terminal and an independent variable.
+        for chromosome in nucleus.population:
+            for node in chromosome.equation.postorder():
+                if isinstance(node.val, DerivedVariable):
+                    self.assertIn(node.val, nucleus.ind_vars)
+                    self.assertIn(node.val, EquationTree.TERMINAL_SET)
+        # Keep breeding with the promoted terminals.
+        nucleus.promote_interval = 0
+        nucleus.evolve(3)
+        nucleus.calculate_error()
+        self.assert_errors_current(nucleus)
+
+    def test_alt_reproduce_keeps_errors_in_place(self):
+        nucleus = self.nucleus()
+        nucleus.calculate_error()
+        nucleus.alt_reproduce()
+        self.assert_errors_current(nucleus)
+        nucleus.sort()
+        self.assertEqual([chromosome.error for chromosome in nucleus.population], nucleus.errors.tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+"""
+Tests for whole-population evaluation against scalar evaluation.
+
+"""
+import random
+import unittest
+
+import numpy as np
+
+from src.chromosome import Chromosome
+from src.equation_tree import EquationTree
+from src.math_functions import Add, Divide, IndependentVariable, Multiply, Subtract
+from src.nucleus import Nucleus
+from src.stack_machine import StackMachineEvaluator
+
+# Class attributes of EquationTree configured by the tests.
+TREE_CONFIG = ('FUNCTION_SET', 'FUNCTION_PROB', 'TERMINAL_SET', 'TERMINAL_PROB', 'MAX_DEPTH')
+
+
+def internal(op, *children):
+    """
+    Build an internal node over children.
+
+    Args:
+        op: The operator.
+        *children (EquationTree): The children of the node.
+
+    Returns:
+        EquationTree: The node.
+
+    """
+    node = EquationTree()
+    node.init_internal(op)
+    node.children = list(children)
+    node.descendents_cnt = sum(child.descendents_cnt + 1 for child in children)
+    return node
+
+
+class StackMachineEvaluatorTest(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(0)
+        self.saved = {name: getattr(EquationTree, name) for name in TREE_CONFIG}
+        xs = [i / 4 - 2 for i in range(17)]
+        self.x = IndependentVariable('x', xs)
+        self.y = IndependentVariable('y', [x * x - 1 for x in xs])
+        self.ind_vars = [self.x, self.y]
+        self.dep_vals = [x ** 3 / 2 + x for x in xs]
+        EquationTree.FUNCTION_SET = (Add, Subtract, Multiply, Divide)
+        EquationTree.FUNCTION_PROB = 4
+        EquationTree.TERMINAL_SET = tuple(range(-5, 6)) + (self.x, self.y)
+        EquationTree.TERMINAL_PROB = 8
+        EquationTree.MAX_DEPTH = 8
+
+    def tearDown(self):
+        for name, value in self.saved.items():
+            setattr(EquationTree, name, value)
+
+    def chromosome(self, equation=None):
+        """
+        Create a chromosome, growing its equation if none is given.
+
+        Args:
+            equation (EquationTree): The equation (optional).
+
+        Returns:
+            Chromosome: The chromosome.
+
+        """
+        chromosome = Chromosome(self.ind_vars, self.dep_vals)
+        if equation is None:
+            chromosome.grow_equation_tree()
+        else:
+            chromosome.equation = equation
+        return chromosome
+
+    def assert_matches_scalar(self, chromosomes, errors):
+        """
+        Check errors against scalar evaluation, including which are infinite.
+
+        Args:
+            chromosomes (list of Chromosome): The chromosomes.
+            errors (list of float): Their errors from the stack machine.
+
+        """
+        for chromosome in chromosomes:
+            Nucleus.evaluate_chromosome(chromosome)
+        expected = np.array([chromosome.error for chromosome in chromosomes])
+        errors = np.array(errors)
+        np.testing.assert_array_equal(np.isinf(errors), np.isinf(expected))
+        finite = np.isfinite(expected)
+        np.testing.assert_allclose(errors[finite], expected[finite], rtol=1e-12)
+
+    def test_matches_scalar_evaluation(self):
+        # Equations of different lengths, so shorter programs are padded with NOPs.
+        chromosomes = [self.chromosome() for _ in range(300)]
+        self.assertGreater(len({chromosome.equation.descendents_cnt for chromosome in chromosomes}), 10)
+        errors = StackMachineEvaluator(self.ind_vars, self.dep_vals)(chromosomes)
+        self.assert_matches_scalar(chromosomes, errors)
+
+    def test_split_passes(self):
+        chromosomes = [self.chromosome() for _ in range(100)]
+        # Room for only a few individuals per pass.
+        evaluator = StackMachineEvaluator(self.ind_vars, self.dep_vals, max_stack_cells=20 * len(self.dep_vals))
+        self.assert_matches_scalar(chromosomes, evaluator(chromosomes))
+        self.assertEqual(evaluator(chromosomes), StackMachineEvaluator(self.ind_vars, self.dep_vals)(chromosomes))
+
+    def test_division_by_zero_and_constants(self):
+        x = EquationTree.leaf(self.x)
+        chromosomes = [
+            # x is zero in one row.
+            self.chromosome(internal(Divide, EquationTree.leaf(1), x)),
+            self.chromosome(internal(Divide, x, internal(Subtract, x, x))),
+            self.chromosome(internal(Divide, x, EquationTree.leaf(0))),
+            # Constant-only programs.
+            self.chromosome(EquationTree.leaf(3)),
+            self.chromosome(internal(Multiply, EquationTree.leaf(2), EquationTree.leaf(-4))),
+            self.chromosome(internal(Divide, EquationTree.leaf(2), EquationTree.leaf(0))),
+            self.chromosome(x)
+        ]
+        errors = StackMachineEvaluator(self.ind_vars, self.dep_vals)(chromosomes)
+        self.assertEqual(np.isinf(errors).tolist(), [True, True, True, False, False, True, False])
+        self.assert_matches_scalar(chromosomes, errors)
+
+
+if __name__ == '__main__':
+    unittest.main()